@@ -6,5 +6,5 @@ setup(name='cards',
       author='wurdum',
       author_email='wurdum.my@gmail.com',
       url='http://www.python.org/sigs/distutils-sig/',
-      install_requires=['Flask>=0.7.2', 'beautifulsoup4>=4.2.0', 'pymongo>=2.5.1', 'eventlet', 'numpy']
+      install_requires=['Flask>=0.7.2', 'beautifulsoup4>=4.2.0', 'pymongo>=3.9,<4', 'eventlet', 'numpy>=1.9']
  )
@@ -0,0 +1,85 @@
+import os
+import sys
+import random
+import time
+import eventlet
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models
+import scrapers
+from scrapers import magiccards, scheduler
+
+RECORDS_NUM = 5000
+NAMES_NUM = 800
+RESOLVE_LATENCY = 0.05
+
+
+def make_collection(records_num=RECORDS_NUM, names_num=NAMES_NUM):
+    """Generates collection export where the same cards are written with different case and spacing
+
+    :return: list of dict (card name, card number)
+    """
+    rnd = random.Random(42)
+    records = []
+    for _ in range(records_num):
+        words = ['card', 'number', str(rnd.randint(1, names_num))]
+        variant = rnd.choice([' '.join(words), '  '.join(words), ' '.join(words).title(), ' '.join(words).upper()])
+        records.append({'name': variant, 'number': rnd.randint(1, 4)})
+
+    return records
+
+
+def stub_resolve_card(record):
+    """
+    Resolves card without network, counts calls
+    """
+    stub_resolve_card.calls += 1
+    eventlet.sleep(RESOLVE_LATENCY)
+    return models.Card(record['name'].lower(), record['number'], redactions=[])
+
+
+def legacy_merge_pups(cards):
+    """
+    Previous implementation that rescans set for every duplicate
+    """
+    unique_cards = set()
+    for card in cards:
+        if card not in unique_cards:
+            unique_cards.add(card)
+        else:
+            for set_card in unique_cards:
+                if set_card == card:
+                    set_card.number += card.number
+
+    return list(unique_cards)
+
+
+def legacy_resolve(content):
+    cards = [card for card in scheduler.imap(magiccards.resolve_card, content)]
+    return legacy_merge_pups(cards)
+
+
+def resolve(content):
+    return scrapers.resolve_cards_async(content)
+
+
+def measure(func):
+    stub_resolve_card.calls = 0
+    start = time.time()
+    cards = func(make_collection())
+    return cards, stub_resolve_card.calls, time.time() - start
+
+
+def run():
+    magiccards.resolve_card = stub_resolve_card
+
+    print 'collection: %d records, %d distinct cards' % (RECORDS_NUM, NAMES_NUM)
+    for name, func in [('legacy', legacy_resolve), ('canonical', resolve)]:
+        cards, calls, seconds = measure(func)
+        print '%-10s %5d resolve calls, %4d cards, %6d copies, %0.2fs' % (name, calls, len(cards),
+                                                                         sum([c.number for c in cards]), seconds)
+
+
+if __name__ == '__main__':
+    run()
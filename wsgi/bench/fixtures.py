@@ -0,0 +1,241 @@
+# coding=utf-8
+import os
+import random
+import urllib
+import urlparse
+
+TCG_PRICE_TABLE_PATH = '/productcatalog/product/getpricetable'
+TCG_PRICE_TABLE_QUERY = '?captureFeaturedSellerData=True&pageSize=50&productId='
+
+TCG_VENDOR_ROW = '''
+<tr class="vendor">
+    <td class="seller">
+        <a href="/seller/%(seller_id)d">Seller %(seller_id)d</a>
+        <span class="actualRating"><a href="/seller/%(seller_id)d/feedback">Rating: %(rating)0.1f%%</a></span>
+        <span class="ratingHeading"><a href="/seller/%(seller_id)d/feedback">%(sales)d+ Sales</a></span>
+    </td>
+    <td class="condition"><a href="/help/condition">Near Mint</a></td>
+    <td class="quantity"> %(quantity)d </td>
+    <td class="price">$%(price)0.2f</td>
+</tr>'''
+
+
+def tcg_price_table(sid, page, pages_num, vendors_num=50):
+    """Builds page of tcgplayer price table with markup parsed by TCGPlayerScrapper.get_full_info
+
+    :param sid: product id
+    :param page: page number starting from 1
+    :param pages_num: total number of pages
+    :param vendors_num: number of offers on page
+    :return: html string
+    """
+    rnd = random.Random('%s-%d' % (sid, page))
+    rows = [TCG_VENDOR_ROW % {'seller_id': rnd.randint(1, 5000),
+                              'rating': rnd.uniform(90, 100),
+                              'sales': rnd.choice([10, 100, 1000]),
+                              'quantity': rnd.randint(1, 8),
+                              'price': rnd.uniform(0.1, 30)} for _ in range(vendors_num)]
+
+    href = TCG_PRICE_TABLE_PATH + TCG_PRICE_TABLE_QUERY + sid + '&pageNumber=%d'
+    numbers = ''.join(['<a href="%s">%d</a>' % (href % number, number) for number in range(1, pages_num + 1)])
+    if page < pages_num:
+        next_link = '<a href="%s">Next &gt;</a>' % (href % (page + 1))
+    else:
+        next_link = '<a disabled="disabled">Next &gt;</a>'
+
+    return '<html><body><table class="priceTable">%s</table><div class="pricePager">%s %s</div></body></html>' % \
+           (''.join(rows), numbers, next_link)
+
+
+class TCGPriceTableSite(object):
+    """
+    Serves price tables of any product, each product has the same number of pages
+    """
+
+    def __init__(self, pages_num, vendors_num=50):
+        self.pages_num = pages_num
+        self.vendors_num = vendors_num
+
+    def __call__(self, path):
+        parts = urlparse.urlparse(path)
+        if parts.path != TCG_PRICE_TABLE_PATH:
+            return None
+
+        params = dict(urlparse.parse_qsl(parts.query))
+        page = int(params.get('pageNumber', '1'))
+        return tcg_price_table(params['productId'], page, self.pages_num, self.vendors_num)
+
+
+PAGE_CHROME = '''<html><head><title>%(title)s</title>
+<link rel="stylesheet" href="/css/main.css" type="text/css">
+<script type="text/javascript">%(script)s</script>
+</head><body>
+<div class="header"><div class="menu">%(menu)s</div></div>
+%(body)s
+<div class="footer"><p>%(footer)s</p></div>
+</body></html>'''
+
+
+def page_chrome(title, body, rnd):
+    """Wraps page content with scripts, menu and footer, so fixture pages have size of real ones
+
+    :param title: page title
+    :param body: html of page content
+    :param rnd: random.Random object
+    :return: html string
+    """
+    script = '\n'.join(['var v%d = "%x"; function f%d(a) { return a + v%d; }' % (i, rnd.getrandbits(64), i, i)
+                        for i in range(150)])
+    menu = ''.join(['<div class="item"><a href="/section/%d" title="Section %d"><span>Section %d</span></a></div>'
+                    % (i, i, i) for i in range(120)])
+    footer = ' '.join(['<a href="/page/%d">Page %d</a>' % (i, i) for i in range(80)])
+    return PAGE_CHROME % {'title': title, 'script': script, 'menu': menu, 'body': body, 'footer': footer}
+
+
+MAGICCARDS_REDA_LINK = '<img src="/images/%(set)s.gif" alt="%(set)s"> <a href="/%(set)s/en/%(number)d.html">' \
+                       'Edition %(set)s (Rare)</a><br>'
+
+
+def magiccards_card_page(name, redas_num=8):
+    """Builds magiccards card page with markup parsed by magiccards.AdvancedResolver
+
+    :param name: card name
+    :param redas_num: number of card editions
+    :return: html string
+    """
+    rnd = random.Random(name)
+    layout_tables = ''.join(['<table class="layout"><tr><td><a href="/">magiccards.info</a></td>'
+                             '<td><form action="/query"><input name="q"></form></td></tr></table>'
+                             for _ in range(3)])
+    redas = ''.join([MAGICCARDS_REDA_LINK % {'set': 's%d' % i, 'number': rnd.randint(1, 300)}
+                     for i in range(1, redas_num)])
+    content = '''
+<table border="0" cellpadding="0" cellspacing="0" width="100%%" align="center">
+  <tr>
+    <td width="312" valign="top"><img src="http://magiccards.info/scans/en/s0/%(number)d.jpg" alt="%(name)s"></td>
+    <td valign="top" width="70%%">
+      <span><a href="/s0/en/%(number)d.html">%(name)s</a></span>
+      <p>Creature - Elf 2/2</p>
+      <p class="ctext"><b>Flying<br><br>When %(name)s enters the battlefield, draw a card.</b></p>
+      <script src="http://partner.tcgplayer.com/x3/mchl.ashx?pk=MAGCINFO&sid=%(sid)d"></script>
+    </td>
+    <td width="180" valign="top"><small>
+      <u><b>Languages:</b></u><br>
+      <img src="/images/en.gif" alt="English"> <b>%(name)s</b><br>
+      <img src="/images/de.gif" alt="German"> <a href="/s0/de/%(number)d.html">%(name)s (de)</a><br>
+      <u><b>Editions:</b></u><br>
+      <img src="/images/s0.gif" alt="s0"> <b>Edition s0 (Rare)</b><br>
+      %(redas)s
+      <u><b>Printings:</b></u><br>
+    </small></td>
+  </tr>
+</table>''' % {'name': name, 'number': rnd.randint(1, 300), 'sid': rnd.randint(1, 99999), 'redas': redas}
+
+    return page_chrome(name, layout_tables + content, rnd)
+
+
+BUYMAGIC_OFFER_ROW = '<tr><td><b>%(type)s</b></td><td>%(price)0.2f грн.</td>' \
+                     '<td><select>%(options)s</select></td></tr>'
+
+
+def buymagic_search_page(name):
+    """Builds buymagic search page with markup parsed by buymagic.parse_offers
+
+    :param name: card name
+    :return: html string
+    """
+    rnd = random.Random(name)
+    rows = ''.join([BUYMAGIC_OFFER_ROW % {'type': card_type, 'price': rnd.uniform(1, 200),
+                                          'options': '<option>1</option>' * rnd.randint(1, 4)}
+                    for card_type in ['Обычный', 'Фольга']])
+    content = '<div class="c2"><p><b>Found:</b><span><div class="card"><a href="/card/%d">%s</a><table>%s</table>' \
+              '</div></span></p></div>' % (rnd.randint(1, 9999), name, rows)
+    return page_chrome(name, content, rnd)
+
+
+SPELLSHOP_CARD_ROW = '<tr><td><img src="/img/%(id)d.jpg"></td><td><a href="/card/%(id)d">%(name)s</a></td>' \
+                     '<td>Edition</td><td>Rare</td><td>%(price)0.2f грн.</td>' \
+                     '<td><select>%(options)s</select></td></tr>'
+
+
+def spellshop_search_page(name):
+    """Builds spellshop search page with markup parsed by spellshop.parse_offer
+
+    :param name: card name
+    :return: html string
+    """
+    rnd = random.Random(name)
+    rows = ''.join([SPELLSHOP_CARD_ROW % {'id': rnd.randint(1, 9999), 'name': name, 'price': rnd.uniform(1, 200),
+                                          'options': '<option>1</option>' * rnd.randint(1, 4)} for _ in range(3)])
+    content = '<table class="layout"><tr><td class="td_left">menu</td><td class="td_center"><table>%s</table></td>' \
+              '</tr></table>' % rows
+    return page_chrome(name, content, rnd)
+
+
+TCG_BRIEF_PATH = '/x3/mchl.ashx'
+TCG_BRIEF_CELL = '<td class=\\\'TCGPHiLo%(kind)s\\\'>%(label)s: <a href=\\\'#\\\'>$%(price)0.2f</a></td>'
+
+
+def tcg_brief_script(sid):
+    """Builds tcgplayer partner script with prices table written by document.write,
+    string is split by '+' like the real one, markup is parsed by TCGPlayerScrapper.get_brief_info
+
+    :param sid: product id
+    :return: javascript string
+    """
+    rnd = random.Random(sid)
+    low = rnd.uniform(0.1, 10)
+    cells = ''.join([TCG_BRIEF_CELL % {'kind': kind, 'label': kind[0], 'price': price}
+                     for kind, price in [('Low', low), ('Mid', low * 2), ('High', low * 4)]])
+    table = '<table><tr><td class=\\\'TCGPHiLoLink\\\'><a href=\\\'http://store.tcgplayer.com/magic/s0/card-%s' \
+            '?partner=MAGCINFO\\\'>Card</a></td>\'+\'%s</tr></table>' % (sid, cells)
+    return "document.write('%s');" % table
+
+
+class ReplaySite(object):
+    """Serves pages of all scraped sites by request path, so scrapers urls could point to one stub server.
+    Pages saved to pages_dir are replayed as they are, file name is quoted request path,
+    other pages are built by fixtures functions.
+
+    :param pages_dir: directory with saved pages or None
+    :param redas_num: number of editions on magiccards card page
+    :param tcg_pages_num: number of pages of tcgplayer price table
+    """
+
+    def __init__(self, pages_dir=None, redas_num=8, tcg_pages_num=4):
+        self.pages_dir = pages_dir
+        self.redas_num = redas_num
+        self.tcg_pages = TCGPriceTableSite(tcg_pages_num)
+
+    def __call__(self, path):
+        saved_page = self._read_saved(path)
+        if saved_page is not None:
+            return saved_page
+
+        parts = urlparse.urlparse(path)
+        params = dict(urlparse.parse_qsl(parts.query))
+        if parts.path == '/query':
+            return magiccards_card_page(params['q'].lstrip('!'), self.redas_num)
+        if parts.path.endswith('.html'):
+            return magiccards_card_page(parts.path, self.redas_num)
+        if parts.path == TCG_BRIEF_PATH:
+            return tcg_brief_script(params['sid'])
+        if parts.path == TCG_PRICE_TABLE_PATH:
+            return self.tcg_pages(path)
+        if parts.path == '/edition/':
+            return buymagic_search_page(params['name'])
+        if parts.path == '/index.php':
+            return spellshop_search_page(params['searchstring'])
+
+        return None
+
+    def _read_saved(self, path):
+        if self.pages_dir is None:
+            return None
+
+        file_path = os.path.join(self.pages_dir, urllib.quote(path, safe=''))
+        if not os.path.exists(file_path):
+            return None
+
+        with open(file_path, 'rb') as f:
+            return f.read()
@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eventlet.green import urllib2
+from scrapers import connections
+from stub import StubServer
+
+REQUESTS_NUM = 2000
+PAGE_SIZE = 20 * 1024
+
+
+def fetch_without_pool(url):
+    """
+    Previous openurl behaviour, new opener and connection per request
+    """
+    opener = urllib2.build_opener()
+    return opener.open(url).read()
+
+
+def fetch_with_pool(pool, url):
+    return pool.request(url, {}).body
+
+
+def measure(fetch, url, requests_num):
+    start = time.time()
+    for i in xrange(requests_num):
+        fetch('%s/page/%d' % (url, i))
+    return requests_num / (time.time() - start)
+
+
+def run():
+    page = 'x' * PAGE_SIZE
+    server = StubServer(pages=lambda path: page).start()
+
+    without_pool = measure(fetch_without_pool, server.url, REQUESTS_NUM)
+    pool = connections.ConnectionPool()
+    with_pool = measure(lambda url: fetch_with_pool(pool, url), server.url, REQUESTS_NUM)
+
+    print 'without pooling: %8.1f requests/sec' % without_pool
+    print 'with pooling:    %8.1f requests/sec (%s)' % (with_pool, pool.get_stats())
+    print 'speedup:         %8.1fx' % (with_pool / without_pool)
+
+    pool.close()
+    server.stop()
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,106 @@
+import os
+import sys
+import random
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models
+
+OFFERS_NUM = 50000
+CARDS_NUM = 500
+# page reads offers of each list this number of times, cost and availability are read by ranking and template
+OFFERS_READS = 4
+COST_READS = 3
+
+
+class LegacyOffer(object):
+    """
+    Previous offer with attributes in __dict__
+    """
+
+    def __init__(self, sid, condition, number, price):
+        self.sid = sid
+        self.condition = condition
+        self.number = number
+        self.price = price
+
+
+class LegacyOffersList(object):
+    """
+    Previous offers list which sorts offers on every access
+    """
+
+    def __init__(self, card):
+        self.card = card
+        self._offers = []
+
+    @property
+    def offers(self):
+        return sorted(self._offers, key=lambda o: o.price)
+
+    @property
+    def available_card_num(self):
+        available = sum([o.number for o in self._offers])
+        return self.card.number if available > self.card.number else available
+
+    @property
+    def card_cost(self):
+        cost = 0.0
+        bought = 0
+        for offer in self.offers:
+            need_cards = self.card.number - bought
+            buy_cards = need_cards if offer.number > need_cards else offer.number
+            bought += buy_cards
+            cost += buy_cards * offer.price
+            if bought == self.card.number:
+                break
+
+        return cost
+
+    def add_offer(self, offer):
+        self._offers.append(offer)
+
+
+def make_lists(list_class, offer_class):
+    rnd = random.Random(42)
+    cards = [models.Card('card %d' % i, rnd.randint(1, 8)) for i in range(CARDS_NUM)]
+    lists = [list_class(card) for card in cards]
+    for i in range(OFFERS_NUM):
+        lists[i % CARDS_NUM].add_offer(offer_class('sid', 'near mint', rnd.randint(1, 4), rnd.uniform(0.1, 20.0)))
+
+    return lists
+
+
+def render(lists):
+    """
+    Reads lists like sellers ranking and page rendering do
+    """
+    total = 0.0
+    for col in lists:
+        for _ in range(OFFERS_READS):
+            total += len(col.offers)
+        for _ in range(COST_READS):
+            total += col.card_cost + col.available_card_num
+
+    return total
+
+
+def get_offer_size(offer):
+    return sys.getsizeof(offer) + (sys.getsizeof(offer.__dict__) if hasattr(offer, '__dict__') else 0)
+
+
+def run():
+    print '%d offers of %d cards' % (OFFERS_NUM, CARDS_NUM)
+    for name, list_class, offer_class in [('legacy', LegacyOffersList, LegacyOffer),
+                                          ('book', models.TCGCardOffersList, models.TCGCardOffer)]:
+        lists = make_lists(list_class, offer_class)
+        start = time.time()
+        total = render(lists)
+        seconds = time.time() - start
+        offer_kb = get_offer_size(lists[0]._offers[0]) * OFFERS_NUM / 1024.0
+        print '%-7s render %0.3fs, offers %0.0f KB, checksum %0.2f' % (name, seconds, offer_kb, total)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,80 @@
+import os
+import sys
+import resource
+import subprocess
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models
+from scrapers import parsing, magiccards, tcgplayer, buymagic, spellshop
+import fixtures
+
+PAGES_NUM = 100
+MODES = [('html.parser', 'off'), ('html.parser', 'on'), ('lxml', 'off'), ('lxml', 'on')]
+
+
+def parse_magiccards(page):
+    resolver = magiccards.AdvancedResolver('http://magiccards.info/s0/en/1.html')
+    soup = parsing.parse(page, magiccards.MAGICCARDS_PART)
+    return resolver._get_card_info(soup), resolver._parse_redas_urls(soup, resolver.url)
+
+
+def parse_tcgplayer(page):
+    scrapper = tcgplayer.TCGPlayerScrapper('1')
+    soup = parsing.parse(page, tcgplayer.PRICE_TABLE_PART, remember=False)
+    return scrapper._parse_offers(soup), scrapper._get_next_link(soup)
+
+
+def parse_buymagic(page):
+    return buymagic.parse_offers(models.Card('card', 1), page)
+
+
+def parse_spellshop(page):
+    return spellshop.parse_offer(models.Card('card', 1), 'http://spellshop.com.ua/index.php', page)
+
+
+# site: (builds page by its number, parses page like scraper does)
+SITES = {
+    'magiccards': (lambda i: fixtures.magiccards_card_page('card %d' % i), parse_magiccards),
+    'tcgplayer': (lambda i: fixtures.tcg_price_table(str(i), 1, 4), parse_tcgplayer),
+    'buymagic': (lambda i: fixtures.buymagic_search_page('card %d' % i), parse_buymagic),
+    'spellshop': (lambda i: fixtures.spellshop_search_page('card %d' % i), parse_spellshop),
+}
+
+
+def measure(site):
+    """Parses pages of site in current process, parser is set by environment
+
+    :return: tuple (pages per second, peak memory growth in KB, average page size in KB)
+    """
+    make_page, parse = SITES[site]
+    pages = [make_page(i) for i in range(PAGES_NUM)]
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.time()
+    for page in pages:
+        if not parse(page):
+            raise ValueError('%s page was not parsed' % site)
+
+    seconds = time.time() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return PAGES_NUM / seconds, peak_rss - base_rss, sum([len(p) for p in pages]) / 1024.0 / PAGES_NUM
+
+
+def run():
+    print '%-11s %-12s %-8s %10s %12s' % ('site', 'parser', 'partial', 'pages/sec', 'peak KB')
+    for site in sorted(SITES):
+        for parser, partial in MODES:
+            env = dict(os.environ, HTML_PARSER=parser, HTML_PARTIAL_PARSING=partial)
+            output = subprocess.check_output([sys.executable, os.path.abspath(__file__), site], env=env)
+            pages_per_sec, peak_kb, page_kb = output.split()
+            print '%-11s %-12s %-8s %10.1f %12s' % ('%s %0.0fK' % (site, float(page_kb)), parser, partial,
+                                                    float(pages_per_sec), peak_kb)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        print '%f %d %f' % measure(sys.argv[1])
+    else:
+        run()
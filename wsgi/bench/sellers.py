@@ -0,0 +1,97 @@
+import os
+import sys
+import random
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ext
+import models
+import scrapers
+
+SELLERS_NUM = 5000
+CARDS_NUM = 20
+REDAS_NUM = 2
+SELLERS_PER_ENTRY = 400
+TOP_NUM = 50
+
+
+def make_task(sellers_num=SELLERS_NUM, cards_num=CARDS_NUM, redas_num=REDAS_NUM, sellers_per_entry=SELLERS_PER_ENTRY):
+    """Generates synthetic task with parsed offers
+
+    :return: tuple (list of models.Card, models.Task)
+    """
+    rnd = random.Random(42)
+    cards = [models.Card('card %d' % i, rnd.randint(1, 4)) for i in range(cards_num)]
+    sellers = [('seller %d' % i, 'http://store.tcgplayer.com/seller/%d' % i) for i in range(sellers_num)]
+
+    entries = []
+    for card in cards:
+        for reda in range(redas_num):
+            sid = '%s-%d' % (card.name, reda)
+            offers = [{'seller': models.TCGSeller(name, url, '99.9%', '100 sales'),
+                       'offers': [models.TCGCardOffer(sid, 'near mint', rnd.randint(1, 4), rnd.uniform(0.1, 20.0))]}
+                      for name, url in rnd.sample(sellers, sellers_per_entry)]
+            entries.append(models.TaskEntry(card.name, 'reda %d' % reda, sid, 'updated', offers=offers))
+
+    return cards, models.Task('bench', 'updated', entries)
+
+
+def legacy_get_tcg_sellers(task, cards):
+    """
+    Previous implementation with linear lookups of sellers, cards and card offers lists
+    """
+    sellers = []
+    for entry in task.entries:
+        card = ext.get_first(cards, lambda c: c.name == entry.card_name)
+        for seller_offers in entry.offers:
+            seller = ext.get_first(sellers, lambda s: s == seller_offers['seller'])
+            if seller is None:
+                seller = seller_offers['seller']
+                sellers.append(seller)
+
+            for offer in seller_offers['offers']:
+                col = ext.get_first(seller.card_offers_lists, lambda c: c.card.name == card.name)
+                if col is None:
+                    col = models.TCGCardOffersList(card)
+                    seller.card_offers_lists.append(col)
+                col.add_offer(offer)
+
+    return sellers
+
+
+def legacy_rank(sellers, cards):
+    available = filter(lambda s: s.has_all_cards(cards), sellers)
+    return sorted(available, key=lambda s: s.cards_cost), \
+        sorted(sellers, key=lambda s: s.available_cards_num, reverse=True)
+
+
+def registry_rank(registry, cards):
+    cards_num = sum([c.number for c in cards])
+    return registry.top(TOP_NUM, key=lambda s: s.cards_cost, condition=lambda s: s.available_cards_num == cards_num), \
+        registry.top(TOP_NUM, key=lambda s: s.available_cards_num, reverse=True)
+
+
+def measure(func, *args):
+    start = time.time()
+    result = func(*args)
+    return result, time.time() - start
+
+
+def run():
+    cards, task = make_task()
+    registry, registry_build = measure(scrapers.get_tcg_sellers, task, cards)
+    _, registry_top = measure(registry_rank, registry, cards)
+    print 'registry: %d sellers, build %0.3fs, top-%d %0.3fs' % (len(registry.sellers), registry_build,
+                                                                   TOP_NUM, registry_top)
+
+    cards, task = make_task()
+    sellers, legacy_build = measure(legacy_get_tcg_sellers, task, cards)
+    _, legacy_sort = measure(legacy_rank, sellers, cards)
+    print 'legacy:   %d sellers, build %0.3fs, sort %0.3fs' % (len(sellers), legacy_build, legacy_sort)
+
+    print 'speedup:  %0.1fx' % ((legacy_build + legacy_sort) / (registry_build + registry_top))
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,76 @@
+import BaseHTTPServer
+import SocketServer
+import random
+import threading
+import time
+
+
+class StubHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Serves pages of stub server with keep-alive connections
+    """
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    wbufsize = -1
+
+    def do_GET(self):
+        server = self.server
+        server.requests += 1
+        if server.latency:
+            time.sleep(server.latency)
+
+        if server.error_rate and server.random.random() < server.error_rate:
+            self._send(503, 'stub error')
+            return
+
+        body = server.get_page(self.path)
+        if body is None:
+            self._send(404, 'not found')
+            return
+
+        self._send(200, body)
+
+    def _send(self, code, body):
+        self.send_response(code)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """Local http server for benchmarks, runs in background thread.
+
+    :param pages: function that returns page body for request path or None
+    :param latency: seconds added to each response
+    :param error_rate: part of requests answered with 503
+    """
+    daemon_threads = True
+
+    def __init__(self, pages=None, latency=0.0, error_rate=0.0, port=0):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', port), StubHandler)
+        self.pages = pages
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.random = random.Random(42)
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%d' % self.server_port
+
+    def get_page(self, path):
+        return self.pages(path) if self.pages else 'stub page %s' % path
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,194 @@
+import argparse
+import gc
+import json
+import os
+import resource
+import sys
+import time
+import urlparse
+import eventlet
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import models
+from scrapers import connections, scheduler, magiccards, tcgplayer, buymagic, spellshop
+from fixtures import ReplaySite
+from stub import StubServer
+
+CALLS_NUM = 40
+CONCURRENCY = 8
+LATENCY = 0.02
+# benchmark fails if throughput falls or latency grows more than this part of baseline
+TOLERANCE = 0.2
+
+
+def resolve_card(i):
+    card = magiccards.resolve_card({'name': 'card %d' % i, 'number': 1})
+    if not card.redactions:
+        raise ValueError('card %d is not resolved' % i)
+
+
+def get_tcg_offers(i):
+    if not tcgplayer.TCGPlayerScrapper(str(i)).get_full_info():
+        raise ValueError('no tcg offers of %d' % i)
+
+
+def get_buymagic_offers(i):
+    if not buymagic.get_offers(models.Card('card %d' % i, 1))[1]:
+        raise ValueError('no buymagic offers of card %d' % i)
+
+
+def get_spellshop_offers(i):
+    if spellshop.get_offers(models.Card('card %d' % i, 1))[1] is None:
+        raise ValueError('no spellshop offer of card %d' % i)
+
+
+# scenario: function that scrapes i-th card end to end
+SCENARIOS = [
+    ('magiccards', resolve_card),
+    ('tcgplayer', get_tcg_offers),
+    ('buymagic', get_buymagic_offers),
+    ('spellshop', get_spellshop_offers),
+]
+
+
+def to_stub(url, stub_url):
+    """
+    Replaces scheme and host of url with ones of stub server
+    """
+    parts = urlparse.urlparse(url)
+    return stub_url + url[len(parts.scheme + '://' + parts.netloc):]
+
+
+def point_scrapers_to(stub_url):
+    """
+    Makes scrapers download pages from stub server, resolved cards aren't read from db or saved
+    """
+    magiccards.MAGICCARDS_BASE_URL = to_stub(magiccards.MAGICCARDS_BASE_URL, stub_url)
+    tcgplayer.BRIEF_BASE_URL = to_stub(tcgplayer.BRIEF_BASE_URL, stub_url)
+    tcgplayer.FULL_BASE_URL = to_stub(tcgplayer.FULL_BASE_URL, stub_url)
+    buymagic.BASE_SEARCH_URL = to_stub(buymagic.BASE_SEARCH_URL, stub_url)
+    spellshop.BASE_SEARCH_URL = to_stub(spellshop.BASE_SEARCH_URL, stub_url)
+
+    db.get_resolved_card = lambda name: None
+    db.save_resolved_card = lambda name, card: None
+
+
+def percentile(values, part):
+    values = sorted(values)
+    return values[min(int(len(values) * part), len(values) - 1)] if values else 0.0
+
+
+def measure(scrape, calls_num, concurrency):
+    """Runs scrape calls in green pool
+
+    :return: dict {calls, errors, throughput, p50, p90, p99, peak_kb, objects}, latencies are in ms
+    """
+    def timed_call(i):
+        start = time.time()
+        try:
+            scrape(i)
+            return time.time() - start, False
+        except Exception:
+            return time.time() - start, True
+
+    gc.collect()
+    objects_before = len(gc.get_objects())
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.time()
+    results = list(eventlet.GreenPool(concurrency).imap(timed_call, range(calls_num)))
+    seconds = time.time() - start
+
+    gc.collect()
+    latencies = [latency * 1000 for latency, failed in results if not failed]
+    return {'calls': calls_num,
+            'errors': len([failed for _, failed in results if failed]),
+            'throughput': calls_num / seconds,
+            'p50': percentile(latencies, 0.5),
+            'p90': percentile(latencies, 0.9),
+            'p99': percentile(latencies, 0.99),
+            'peak_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before,
+            'objects': len(gc.get_objects()) - objects_before}
+
+
+def find_regressions(results, baseline, tolerance=TOLERANCE):
+    """Compares results with saved ones
+
+    :param results: dict {scenario: measure result}
+    :param baseline: dict with results of previous run
+    :return: list of regression descriptions
+    """
+    regressions = []
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            continue
+
+        if result['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append('%s throughput %0.1f/s, baseline %0.1f/s' % (name, result['throughput'],
+                                                                           base['throughput']))
+        if result['p90'] > base['p90'] * (1 + tolerance):
+            regressions.append('%s p90 %0.1fms, baseline %0.1fms' % (name, result['p90'], base['p90']))
+        if result['errors'] > base['errors']:
+            regressions.append('%s %d errors, baseline %d' % (name, result['errors'], base['errors']))
+
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Runs scrapers against local stub server with replayed pages')
+    parser.add_argument('scenarios', nargs='*', default=[name for name, _ in SCENARIOS])
+    parser.add_argument('--calls', type=int, default=CALLS_NUM, help='scraped cards per scenario')
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY)
+    parser.add_argument('--latency', type=float, default=LATENCY, help='seconds added to each response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='part of responses that are 503')
+    parser.add_argument('--pages', help='directory with saved pages, file name is quoted request path')
+    parser.add_argument('--save', help='writes results to json file')
+    parser.add_argument('--baseline', help='json file of previous run, exit code is 1 on regression')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    return parser.parse_args()
+
+
+def run():
+    args = parse_args()
+    server = StubServer(pages=ReplaySite(args.pages), latency=args.latency, error_rate=args.error_rate).start()
+    point_scrapers_to(server.url)
+    scheduler.scheduler.configure('127.0.0.1', concurrency=64, max_concurrency=64, rate=10000, burst=10000)
+
+    print 'stub: %0.3fs latency, %0.0f%% errors, %d calls, concurrency %d' % (args.latency, args.error_rate * 100,
+                                                                          args.calls, args.concurrency)
+    print '%-11s %9s %7s %9s %9s %9s %9s %9s' % ('scenario', 'calls/sec', 'errors', 'p50 ms', 'p90 ms', 'p99 ms',
+                                                'peak KB', 'objects')
+    results = {}
+    for name, scrape in SCENARIOS:
+        if name not in args.scenarios:
+            continue
+
+        requests_before = server.requests
+        result = measure(scrape, args.calls, args.concurrency)
+        result['requests'] = server.requests - requests_before
+        results[name] = result
+        print '%-11s %9.1f %7d %9.1f %9.1f %9.1f %9d %9d' % (name, result['throughput'], result['errors'],
+                                                            result['p50'], result['p90'], result['p99'],
+                                                            result['peak_kb'], result['objects'])
+
+    connections.connection_pool.close()
+    server.stop()
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+
+        for regression in regressions:
+            print 'REGRESSION %s' % regression
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    run()
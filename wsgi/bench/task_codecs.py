@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bson
+import models
+import serializers
+from sellers import make_task
+
+SELLERS_NUM = 2000
+CARDS_NUM = 30
+REDAS_NUM = 2
+SELLERS_PER_ENTRY = 200
+ROUNDS_NUM = 5
+
+
+def legacy_todict(obj):
+    """
+    Previous reflection based converter, it replaces values of dicts in place
+    """
+    if isinstance(obj, dict):
+        for k in obj.keys():
+            obj[k] = legacy_todict(obj[k])
+        return obj
+    elif hasattr(obj, '__iter__'):
+        return [legacy_todict(v) for v in obj]
+    elif hasattr(obj, '__dict__') or hasattr(obj, '__slots__'):
+        attributes = obj.__dict__.iteritems() if hasattr(obj, '__dict__') else \
+            [(key, getattr(obj, key)) for key in obj.__slots__ if hasattr(obj, key)]
+        return dict([(key, legacy_todict(value)) for key, value in attributes
+                     if not callable(value) and not key.startswith('_')])
+    else:
+        return obj
+
+
+def legacy_totask(dict_task):
+    """
+    Previous eager conversion with keyword arguments
+    """
+    entries = []
+    for e in dict_task['entries']:
+        offers = [{'seller': models.TCGSeller(**o['seller']),
+                   'offers': [models.TCGCardOffer(**dict_offer) for dict_offer in o['offers']]}
+                  for o in e['offers']] if e.get('offers') else None
+        entries.append(models.TaskEntry(e['card_name'], e['card_reda'], e['card_sid'], e['status'], offers=offers))
+
+    return models.Task(dict_task['token'], dict_task['status'], entries=entries)
+
+
+def encode_plain(task):
+    serializers.PACKED_OFFERS = False
+    return serializers.encode_task(task)
+
+
+def encode_packed(task):
+    serializers.PACKED_OFFERS = True
+    return serializers.encode_task(task)
+
+
+def read_offers(task):
+    """
+    Reads every offer like sellers registry does, so lazy conversion is measured too
+    """
+    return sum([offer.number for entry in task.entries for item in entry.offers for offer in item['offers']])
+
+
+def measure(encode, decode):
+    """Round trip of task through bson like in save_task and get_task
+
+    :return: tuple (document KB, encode seconds, decode seconds, checksum)
+    """
+    encode_seconds = decode_seconds = 0.0
+    for _ in range(ROUNDS_NUM):
+        # legacy converter replaces offers of task, so every round gets new one
+        _, task = make_task(SELLERS_NUM, CARDS_NUM, REDAS_NUM, SELLERS_PER_ENTRY)
+
+        start = time.time()
+        data = bson.BSON.encode(encode(task))
+        encode_seconds += time.time() - start
+
+        start = time.time()
+        checksum = read_offers(decode(bson.BSON(data).decode()))
+        decode_seconds += time.time() - start
+
+    return len(data) / 1024, encode_seconds / ROUNDS_NUM, decode_seconds / ROUNDS_NUM, checksum
+
+
+def run():
+    print 'task of %d entries x %d sellers' % (CARDS_NUM * REDAS_NUM, SELLERS_PER_ENTRY)
+    print '%-8s %10s %10s %10s %10s' % ('codec', 'KB', 'encode s', 'decode s', 'checksum')
+    for name, encode, decode in [('todict', legacy_todict, legacy_totask),
+                                 ('plain', encode_plain, serializers.decode_task),
+                                 ('packed', encode_packed, serializers.decode_task)]:
+        print '%-8s %10d %10.3f %10.3f %10d' % ((name,) + measure(encode, decode))
+
+
+if __name__ == '__main__':
+    run()
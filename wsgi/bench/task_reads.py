@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bson
+import db
+import models
+import serializers
+from sellers import make_task
+
+SELLERS_NUM = 2000
+CARDS_NUM = 30
+REDAS_NUM = 2
+SELLERS_PER_ENTRY = 200
+READS_NUM = 20
+
+
+def eager_totask(dict_task):
+    """
+    Previous conversion that builds every offer of every entry
+    """
+    entries = [models.TaskEntry(e['card_name'], e['card_reda'], e['card_sid'], e['status'],
+                                offers=[serializers.decode_seller_offers(o) for o in e['offers']]
+                                if e.get('offers') else None) for e in dict_task['entries']]
+    return models.Task(dict_task['token'], dict_task['status'], entries=entries)
+
+
+def project(dict_task, fields):
+    """
+    Keeps fields of task like db projection does
+    """
+    entries_fields = [f.split('.', 1)[1] for f in fields if f.startswith('entries.')]
+    projected = dict([(f, dict_task[f]) for f in fields if f in dict_task])
+    projected['entries'] = [dict([(f, e[f]) for f in entries_fields if f in e]) for e in dict_task['entries']]
+    return projected
+
+
+def read_statuses(data, totask):
+    """
+    Decodes task like driver does and reads what status page shows
+    """
+    task = totask(bson.BSON(data).decode())
+    return [(e.card_name, e.status) for e in task.entries]
+
+
+def measure(data, totask):
+    start = time.time()
+    for _ in range(READS_NUM):
+        read_statuses(data, totask)
+
+    return (time.time() - start) / READS_NUM
+
+
+def run():
+    _, task = make_task(SELLERS_NUM, CARDS_NUM, REDAS_NUM, SELLERS_PER_ENTRY)
+    # offers are stored as documents to compare their eager and lazy conversion
+    serializers.PACKED_OFFERS = False
+    dict_task = serializers.encode_task(task)
+    whole = bson.BSON.encode(dict_task)
+    status = bson.BSON.encode(project(dict_task, db.TASK_STATUS_FIELDS.keys()))
+
+    print 'status page of task with %d entries x %d sellers' % (len(task.entries), SELLERS_PER_ENTRY)
+    for name, data, totask in [('eager', whole, eager_totask),
+                               ('lazy', whole, serializers.decode_task),
+                               ('projected', status, serializers.decode_task)]:
+        print '%-10s %8d KB read, %0.4fs per poll' % (name, len(data) / 1024, measure(data, totask))
+
+
+if __name__ == '__main__':
+    run()
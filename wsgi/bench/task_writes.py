@@ -0,0 +1,67 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bson
+import serializers
+from sellers import make_task
+
+SELLERS_NUM = 2000
+CARDS_NUM = 30
+REDAS_NUM = 2
+SELLERS_PER_ENTRY = 100
+
+
+def get_parsed_task():
+    """
+    Returns synthetic task and copy of its entries before parsing
+    """
+    _, task = make_task(SELLERS_NUM, CARDS_NUM, REDAS_NUM, SELLERS_PER_ENTRY)
+    parsed = [(e.offers, e.status) for e in task.entries]
+    for entry in task.entries:
+        entry.offers = None
+        entry.status = 'not updated'
+
+    return task, parsed
+
+
+def whole_task_bytes():
+    """
+    Bytes sent when the whole task document is replaced after every entry
+    """
+    task, parsed = get_parsed_task()
+    written = 0
+    for entry, (offers, status) in zip(task.entries, parsed):
+        entry.offers, entry.status = offers, status
+        written += len(bson.BSON.encode(serializers.encode_task(task)))
+
+    return written
+
+
+def entries_bytes():
+    """
+    Bytes sent when only offers and status of parsed entry are set
+    """
+    task, parsed = get_parsed_task()
+    written = 0
+    for index, (entry, (offers, status)) in enumerate(zip(task.entries, parsed)):
+        entry.offers, entry.status = offers, status
+        update = {'$set': {'entries.%d.offers' % index: serializers.encode_offers(entry.offers),
+                           'entries.%d.status' % index: entry.status}}
+        written += len(bson.BSON.encode(update))
+
+    return written
+
+
+def run():
+    whole = whole_task_bytes()
+    entries = entries_bytes()
+    print 'task: %d entries x %d sellers' % (CARDS_NUM * REDAS_NUM, SELLERS_PER_ENTRY)
+    print 'whole task writes: %8.1f KB' % (whole / 1024.0)
+    print 'entry writes:      %8.1f KB' % (entries / 1024.0)
+    print 'ratio:             %8.1fx' % (float(whole) / entries)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models
+import optimizer
+import prices
+import scrapers
+from run import app, render_template, SELLERS_ON_PAGE
+from sellers import make_task
+
+SELLERS_NUM = 2000
+CARDS_NUM = 60
+REDAS_NUM = 8
+SELLERS_PER_ENTRY = 300
+
+
+def add_redactions(cards):
+    """
+    Gives cards redactions with sids of offers made by sellers.make_task
+    """
+    for card in cards:
+        card.redactions = [models.Redaction('reda %d' % reda,
+                                            info=models.CardInfo('http://magiccards.info/%d' % reda, '', []),
+                                            prices=models.CardPrices('%s-%d' % (card.name, reda), '', 1.0, 2.0, 3.0))
+                           for reda in range(REDAS_NUM)]
+
+
+def render(task, cards):
+    """
+    Renders tcg sellers page like tcg route does
+    """
+    sellers = scrapers.get_tcg_sellers(task, cards)
+    cards_num = sum([c.number for c in cards])
+    sellers_av = sellers.top(SELLERS_ON_PAGE, key=lambda s: s.cards_cost,
+                             condition=lambda s: s.available_cards_num == cards_num)
+    sellers_al = sellers.top(SELLERS_ON_PAGE, key=lambda s: s.available_cards_num, reverse=True)
+    cart = optimizer.optimize_cart(task, cards)
+
+    with app.test_request_context('/bench/shop/tcg'):
+        start = time.time()
+        page = render_template('cards_tcg_sellers.html', token='bench', cards=cards,
+                               sellers_groups={'av': sellers_av, 'al': sellers_al}, cart=cart)
+        return time.time() - start, len(page)
+
+
+def run():
+    print 'tcg page of %d cards x %d redactions, %d offers per redaction' % (CARDS_NUM, REDAS_NUM, SELLERS_PER_ENTRY)
+    for name, make_list in [('scan', list), ('sid index', prices.PricedCards)]:
+        # sellers of task collect offers while page is built, so every page gets new task
+        cards, task = make_task(SELLERS_NUM, CARDS_NUM, REDAS_NUM, SELLERS_PER_ENTRY)
+        add_redactions(cards)
+        seconds, size = render(task, make_list(cards))
+        print '%-10s render %0.3fs, %d KB' % (name, seconds, size / 1024)
+
+
+if __name__ == '__main__':
+    run()
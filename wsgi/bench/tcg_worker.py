@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models
+from scrapers import connections, scheduler, tcgplayer
+from worker import daemon
+from fixtures import TCGPriceTableSite, TCG_PRICE_TABLE_PATH, TCG_PRICE_TABLE_QUERY
+from stub import StubServer
+
+CARDS_NUM = 10
+REDAS_NUM = 2
+PAGES_NUM = 4
+LATENCY = 0.3
+
+
+def make_entries(cards_num=CARDS_NUM, redas_num=REDAS_NUM):
+    return [models.TaskEntry('card %d' % card, 'reda %d' % reda, '%d%d' % (card, reda))
+            for card in range(cards_num) for reda in range(redas_num)]
+
+
+def measure(entries_pool_size, pages_pool_size):
+    """Scrapes entries of one task
+
+    :return: tuple (seconds, number of parsed offers)
+    """
+    daemon.ENTRIES_POOL_SIZE = entries_pool_size
+    tcgplayer.PAGES_POOL_SIZE = pages_pool_size
+
+    start = time.time()
+    offers_num = 0
+    for _, offers in daemon.scrape_entries(list(enumerate(make_entries()))):
+        offers_num += sum([len(seller_offers['offers']) for seller_offers in offers])
+
+    return time.time() - start, offers_num
+
+
+def run():
+    server = StubServer(pages=TCGPriceTableSite(PAGES_NUM), latency=LATENCY).start()
+    tcgplayer.FULL_BASE_URL = server.url + TCG_PRICE_TABLE_PATH + TCG_PRICE_TABLE_QUERY
+    scheduler.scheduler.configure('127.0.0.1', concurrency=16, max_concurrency=16, rate=1000, burst=1000)
+
+    print 'task: %d entries x %d pages, %0.2fs latency' % (CARDS_NUM * REDAS_NUM, PAGES_NUM, LATENCY)
+    for entries_pool_size, pages_pool_size in [(1, 1), (1, 4), (4, 4)]:
+        seconds, offers_num = measure(entries_pool_size, pages_pool_size)
+        print 'entries pool %d, pages pool %d: %6.2fs per task, %d offers' % (entries_pool_size, pages_pool_size,
+                                                                              seconds, offers_num)
+
+    connections.connection_pool.close()
+    server.stop()
+
+
+if __name__ == '__main__':
+    run()
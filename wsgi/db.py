@@ -1,84 +1,274 @@
 import os
+import threading
+from datetime import datetime, timedelta
 import pymongo
+from bson.objectid import ObjectId
+from pymongo import errors, monitoring
 import models
-import filters
+import prices
 import ext
+import serializers
+import metrics
 
 MONGO_URL = os.environ.get('OPENSHIFT_MONGODB_DB_URL', 'localhost')
 DB = os.environ.get('OPENSHIFT_APP_NAME', 'cards')
+MONGO_POOL_SIZE = int(os.environ.get('MONGO_POOL_SIZE', '10'))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '5000'))
+MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', '30000'))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '5000'))
+CARD_INFO_TTL = timedelta(hours=int(os.environ.get('CARD_INFO_TTL_HOURS', '720')))
+CARD_PRICES_TTL = timedelta(hours=int(os.environ.get('CARD_PRICES_TTL_HOURS', '24')))
+TOKEN_ATTEMPTS = 10
+LIST_SUMMARY_FIELDS = {'token': 1, 'cards_num': 1, 'price': 1, 'created_at': 1, 'summary_stale': 1}
+# fields of cards read by views that don't show card images and descriptions
+CARD_BRIEF_FIELDS = ['name', 'number', 'redactions.name', 'redactions.info.url', 'redactions.prices']
+# fields of cards read by upload stats
+CARD_STATS_FIELDS = ['name', 'number', 'redactions.name']
+# task fields without parsed offers, enough to show or continue parsing
+TASK_STATUS_FIELDS = {'token': 1, 'status': 1, 'entries.card_name': 1, 'entries.card_reda': 1,
+                      'entries.card_sid': 1, 'entries.status': 1}
+SHOP_OFFERS_TTL = timedelta(hours=int(os.environ.get('SHOP_OFFERS_TTL_HOURS', '6')))
+JOB_LEASE = timedelta(seconds=int(os.environ.get('JOB_LEASE_SECONDS', '120')))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '3'))
+WORKER_TTL = timedelta(seconds=int(os.environ.get('WORKER_TTL_SECONDS', '60')))
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Counts connections opened by client of the current process
+    """
+
+    def __init__(self):
+        self.created = 0
+        self.closed = 0
+        self.checked_out = 0
+        self.checked_in = 0
+        self.check_out_failed = 0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.closed += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self.check_out_failed += 1
 
+    def connection_checked_out(self, event):
+        self.checked_out += 1
 
-def get_unique_token():
-    """Generates unique token
+    def connection_checked_in(self, event):
+        self.checked_in += 1
 
-    :return: string token
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+_pool_stats = PoolStatsListener()
+
+
+def get_client():
+    """Returns mongo client shared by the process, creates it on the first call.
+    Client doesn't connect in constructor, so lock is never held while greenlet switches,
+    and forked process creates its own client instead of sharing sockets with parent.
+
+    :return: pymongo.MongoClient object
+    """
+    global _client, _client_pid, _pool_stats
+
+    if _client is None or _client_pid != os.getpid():
+        with _client_lock:
+            if _client is None or _client_pid != os.getpid():
+                _pool_stats = PoolStatsListener()
+                _client = pymongo.MongoClient(MONGO_URL,
+                                              connect=False,
+                                              maxPoolSize=MONGO_POOL_SIZE,
+                                              connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+                                              socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+                                              waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+                                              event_listeners=[_pool_stats])
+                _client_pid = os.getpid()
+
+    return _client
+
+
+def get_db():
+    """
+    Returns application database using shared client
     """
-    connection = pymongo.MongoClient(MONGO_URL)
-    db = connection[DB]
+    return get_client()[DB]
 
-    while True:
-        token = ext.get_token()
-        if db.list.find_one({'token': token}) is None:
-            return token
+
+def get_pool_stats():
+    """Returns connections statistics of the current process
+
+    :return: dict {pid, pool size, open, in use, created, closed, check out failures}
+    """
+    return {'pid': os.getpid(),
+            'pool_size': MONGO_POOL_SIZE,
+            'open': _pool_stats.created - _pool_stats.closed,
+            'in_use': _pool_stats.checked_out - _pool_stats.checked_in,
+            'created': _pool_stats.created,
+            'closed': _pool_stats.closed,
+            'check_out_failed': _pool_stats.check_out_failed}
 
 
 def get_tokens():
     """
     Returns list of tokens
     """
-    connection = pymongo.MongoClient(MONGO_URL)
-    db = connection[DB]
+    db = get_db()
 
     return [rec['token'] for rec in db.list.find({}, {'token': 1})]
 
 
-def get_cards(token, only_resolved=False):
-    """Searches cards list by token
+def get_cards(token, only_resolved=False, fields=None):
+    """Searches cards list by token, unresolved cards are filtered out by db
 
-    :return: list of models.Card objects
+    :param only_resolved: if True, only cards with redactions are returned
+    :param fields: list of loaded card fields like CARD_BRIEF_FIELDS or None to load whole cards
+    :return: prices.PricedCards list of models.Card objects
     """
-    connection = pymongo.MongoClient(MONGO_URL)
-    db = connection[DB]
+    db = get_db()
 
-    dict_obj = db.list.find_one({'token': token})
+    pipeline = [{'$match': {'token': token}}]
+    if only_resolved:
+        is_resolved = {'$gt': [{'$size': {'$ifNull': ['$$card.redactions', []]}}, 0]}
+        pipeline.append({'$project': {'cards': {'$filter': {'input': '$cards', 'as': 'card', 'cond': is_resolved}}}})
+    if fields:
+        pipeline.append({'$project': dict([('cards.' + field, 1) for field in fields])})
+
+    dict_obj = next(db.list.aggregate(pipeline), None)
     if not dict_obj:
-        return []
+        return prices.PricedCards([])
 
-    cards = [tocard(dc) for dc in dict_obj['cards']]
+    if fields is None or 'redactions.prices' in fields:
+        _apply_catalog_prices(dict_obj['cards'])
 
-    return filter(lambda c: c.is_resolved, cards) if only_resolved else cards
+    return prices.PricedCards([serializers.decode_card(dc) for dc in dict_obj['cards']])
+
+
+def _apply_catalog_prices(dict_cards):
+    """
+    Replaces prices stored in list with the latest ones of sids catalog
+    """
+    dict_prices = [reda['prices'] for dict_card in dict_cards for reda in dict_card.get('redactions', [])
+                   if reda.get('prices')]
+    if not dict_prices:
+        return
+
+    catalog = get_sid_prices([p['sid'] for p in dict_prices])
+    for p in dict_prices:
+        if p['sid'] in catalog:
+            p.update(catalog[p['sid']][0])
 
 
 def get_last_cards_lists(show_private=False, lists_number=5):
-    """Gets all cards lists that present in db
+    """Gets summaries of the newest cards lists, cards themselves aren't loaded
 
-    :return: returns list of models.CardList objects
+    :return: returns list of models.CardsList objects
     """
-    connection = pymongo.MongoClient(MONGO_URL)
-    db = connection[DB]
+    db = get_db()
 
     cards_lists = []
     query_filter = {'list_type': 'public'} if not show_private else {}
-    for cl in db.list.find(query_filter).sort('$natural', -1).limit(lists_number):
-        token = cl['token']
-        cards = [tocard(dc) for dc in cl['cards']]
+    cursor = db.list.find(query_filter, LIST_SUMMARY_FIELDS).sort('created_at', pymongo.DESCENDING).limit(lists_number)
+    for cl in cursor:
+        if 'cards_num' not in cl or cl.get('summary_stale'):
+            # list was saved before summaries were stored or prices of its cards are changed
+            cl.update(refresh_cards_summary(cl['token']))
 
-        cards_list = models.CardsList(token, sum(c.number for c in cards),
-                                      dict([(prop, filters.price_sum(cards, prop)) for prop in ['low', 'mid', 'high']]))
-
-        cards_lists.append(cards_list)
+        created_at = cl.get('created_at', cl['_id'].generation_time.replace(tzinfo=None))
+        cards_lists.append(models.CardsList(cl['token'], cl['cards_num'], cl['price'], created_at=created_at))
 
     return cards_lists
 
 
-def save_cards(token, list_type, cards):
+def get_cards_summary(cards):
+    """Calculates summary fields of cards list
+
+    :param cards: list of models.Card
+    :return: dict {cards_num, price: {low, mid, high}}
     """
-    Saves cards list to db with token as key
+    return {'cards_num': sum([c.number for c in cards]), 'price': prices.get_matrix(cards).get_totals()}
+
+
+def save_new_cards(list_type, cards):
+    """Saves cards list to db with new token as key, summary of list is stored with it.
+    Token is unique by index, so insert is retried with another token on collision.
+
+    :param list_type: public or private
+    :param cards: list of models.Card
+    :return: token of saved list
+    """
+    db = get_db()
+
+    dict_list = {'list_type': list_type, 'cards': [serializers.encode_card(c) for c in cards],
+                 'created_at': datetime.utcnow(), 'rev': ObjectId()}
+    dict_list.update(get_cards_summary(cards))
+    add_sid_prices([reda.prices for card in cards for reda in card.redactions if reda.prices is not None])
+    for attempt in range(TOKEN_ATTEMPTS):
+        dict_list['token'] = ext.get_token()
+        dict_list.pop('_id', None)
+        try:
+            db.list.insert(dict_list)
+            return dict_list['token']
+        except errors.DuplicateKeyError:
+            if attempt == TOKEN_ATTEMPTS - 1:
+                raise
+
+
+def save_cards_summary(token, cards):
+    """Updates summary of cards list, should be called when prices of its cards are changed
+
+    :param token: cards list token
+    :param cards: list of models.Card of the list
+    :return: dict with summary fields
+    """
+    db = get_db()
+
+    summary = get_cards_summary(cards)
+    db.list.update({'token': token}, {'$set': dict(summary, rev=ObjectId()), '$unset': {'summary_stale': ''}})
+    return summary
+
+
+def get_list_rev(token):
+    """Returns revision of cards list, it is changed when cards or their prices are changed
+
+    :param token: cards list token
+    :return: string or None if there is no list
     """
-    connection = pymongo.MongoClient(MONGO_URL)
-    db = connection[DB]
+    db = get_db()
+
+    dict_obj = db.list.find_one({'token': token}, {'rev': 1})
+    if dict_obj is None:
+        return None
+
+    return str(dict_obj.get('rev', dict_obj['_id']))
+
 
-    db.list.insert({'token': token, 'list_type': list_type, 'cards': [todict(c) for c in cards]})
+def refresh_cards_summary(token):
+    """Recalculates summary of cards list from its stored cards
+
+    :param token: cards list token
+    :return: dict with summary fields
+    """
+    return save_cards_summary(token, get_cards(token))
 
 
 def delete_cards(token):
@@ -86,24 +276,23 @@ def delete_cards(token):
 
     :param token: token using which will be found cards list that will be deleted
     """
-    connection = pymongo.MongoClient(MONGO_URL)
-    db = connection[DB]
+    db = get_db()
 
     db.list.remove({'token': token})
 
 
-def get_task(token):
-    """
-    Returns task for cards list with specified token
+def get_task(token, with_offers=True):
+    """Returns task for cards list with specified token
+
+    :param with_offers: if False, parsed offers aren't loaded
     """
-    connection = pymongo.MongoClient(MONGO_URL)
-    db = connection[DB]
+    db = get_db()
 
-    dbtask = db.tasks.find_one({'token': token})
+    dbtask = db.tasks.find_one({'token': token}, None if with_offers else TASK_STATUS_FIELDS)
     if dbtask is None:
         return None
 
-    return totask(dbtask)
+    return serializers.decode_task(dbtask)
 
 
 def save_task(task):
@@ -111,80 +300,386 @@ def save_task(task):
 
     :param task: models.Task object
     """
-    connection = pymongo.MongoClient(MONGO_URL)
-    db = connection[DB]
+    db = get_db()
+
+    db.tasks.update({'token': task.token}, dict(serializers.encode_task(task), rev=ObjectId()), upsert=True)
+
+
+def get_updated_task_rev(token):
+    """Returns revision of task, it is changed with every write of task
+
+    :param token: cards list token
+    :return: string or None if task doesn't exist or isn't updated yet
+    """
+    db = get_db()
+
+    dict_obj = db.tasks.find_one({'token': token}, {'rev': 1, 'status': 1})
+    if dict_obj is None or dict_obj['status'] != 'updated':
+        return None
+
+    return str(dict_obj.get('rev', dict_obj['_id']))
+
+
+def save_task_entries(token, indexed_entries):
+    """Updates offers and status of several task entries with one write
+
+    :param token: cards list token
+    :param indexed_entries: list of tuples (position of entry in task entries, models.TaskEntry)
+    """
+    db = get_db()
+
+    fields = {}
+    for index, entry in indexed_entries:
+        fields['entries.%d.offers' % index] = serializers.encode_offers(entry.offers)
+        fields['entries.%d.status' % index] = entry.status
+
+    if fields:
+        fields['rev'] = ObjectId()
+        db.tasks.update({'token': token}, {'$set': fields})
+
+
+def save_task_status(token, status):
+    """
+    Updates status of task without rewriting its entries
+    """
+    db = get_db()
 
-    db.tasks.update({'token': task.token}, todict(task), upsert=True)
+    db.tasks.update({'token': token}, {'$set': {'status': status, 'rev': ObjectId()}})
 
 
 def delete_task(token):
     """
     Removes task for token
     """
-    connection = pymongo.MongoClient(MONGO_URL)
-    db = connection[DB]
+    db = get_db()
 
     db.tasks.remove({'token': token})
 
 
-def tocard(dict_card):
+def get_resolved_card(name):
+    """Searches resolved card in cache by name
+
+    :param name: card name as it was in uploaded list
+    :return: tuple (card name, list of models.Redaction, True if prices are fresh) or None
+    """
+    db = get_db()
+
+    dict_obj = db.resolved.find_one({'key': ext.normalize_name(name)})
+    if dict_obj is None:
+        return None
+
+    now = datetime.utcnow()
+    if dict_obj['info_at'] < now - CARD_INFO_TTL:
+        return None
+
+    redas = [serializers.decode_reda(r) for r in dict_obj['redactions']]
+    return dict_obj['name'], redas, dict_obj['prices_at'] >= now - CARD_PRICES_TTL
+
+
+def save_resolved_card(name, card):
+    """Saves resolved card to cache by name from uploaded list and by card name
+
+    :param name: card name as it was in uploaded list
+    :param card: models.Card object
+    """
+    db = get_db()
+
+    now = datetime.utcnow()
+    redas = [serializers.encode_reda(r) for r in card.redactions]
+    for key in set([ext.normalize_name(name), ext.normalize_name(card.name)]):
+        db.resolved.update({'key': key},
+                           {'key': key, 'name': card.name, 'redactions': redas, 'info_at': now, 'prices_at': now},
+                           upsert=True)
+
+    save_sid_prices([r.prices for r in card.redactions if r.prices is not None])
+
+
+def save_resolved_prices(name, card_name, redactions):
+    """Updates prices of resolved card in cache by name from uploaded list and by card name
+
+    :param name: card name as it was in uploaded list
+    :param card_name: resolved card name
+    :param redactions: list of models.Redaction with refreshed prices
+    """
+    db = get_db()
+
+    dict_redas = [serializers.encode_reda(r) for r in redactions]
+    db.resolved.update({'key': {'$in': list(set([ext.normalize_name(name), ext.normalize_name(card_name)]))}},
+                       {'$set': {'redactions': dict_redas, 'prices_at': datetime.utcnow()}}, multi=True)
+    save_sid_prices([r.prices for r in redactions if r.prices is not None])
+
+
+def get_sid_prices(sids):
+    """Searches brief prices of tcg sids in catalog, that is shared by all lists
+
+    :param sids: list of tcg sids
+    :return: dict {sid: tuple (dict {sid, url, low, mid, high}, True if prices are fresh)}
+    """
+    db = get_db()
+
+    fresh_after = datetime.utcnow() - CARD_PRICES_TTL
+    found = {}
+    for dict_obj in db.sid_prices.find({'sid': {'$in': list(set(sids))}, 'url': {'$exists': True}}, {'_id': 0}):
+        fetched_at = dict_obj.pop('fetched_at')
+        found[dict_obj['sid']] = (dict_obj, fetched_at >= fresh_after)
+
+    return found
+
+
+def save_sid_prices(card_prices, fetched_at=None):
+    """Replaces catalog prices of sids with just fetched ones in one bulk request.
+    Lists with changed prices get new revision, so their cached pages aren't shown, and stale summary.
+
+    :param card_prices: list of models.CardPrices
+    :param fetched_at: time of fetch, now by default
+    """
+    current = get_sid_prices([p.sid for p in card_prices])
+    changed = [p.sid for p in card_prices if p.sid not in current or current[p.sid][0] !=
+               {'sid': p.sid, 'url': p.url, 'low': p.low, 'mid': p.mid, 'high': p.high}]
+
+    _write_sid_prices(card_prices, '$set', fetched_at or datetime.utcnow())
+    if changed:
+        mark_stale_summaries(changed)
+
+
+def add_sid_prices(card_prices):
+    """
+    Adds prices of sids which aren't in catalog yet, existing prices aren't changed
+    """
+    _write_sid_prices(card_prices, '$setOnInsert', datetime.utcnow())
+
+
+def _write_sid_prices(card_prices, operator, fetched_at):
+    db = get_db()
+
+    if not card_prices:
+        return
+
+    bulk = db.sid_prices.initialize_unordered_bulk_op()
+    for p in card_prices:
+        bulk.find({'sid': p.sid}).upsert().update({operator: {'url': p.url, 'low': p.low, 'mid': p.mid,
+                                                              'high': p.high, 'fetched_at': fetched_at}})
+    bulk.execute()
+
+
+def touch_sid_prices(sids):
+    """
+    Marks sids as checked without changing their prices, tcg doesn't know them
+    """
+    db = get_db()
+
+    db.sid_prices.update({'sid': {'$in': sids}}, {'$set': {'fetched_at': datetime.utcnow()}}, multi=True)
+
+
+def sync_sid_catalog(batch_size=1000):
+    """Adds sids of stored lists which aren't in catalog, they get the oldest fetch time
+    and are refreshed first, until then lists keep their own prices.
+    Sids are read by aggregation cursor and added in batches, so number of sids isn't limited.
+
+    :param batch_size: number of sids added by one bulk request
+    :return: number of added sids
+    """
+    db = get_db()
+
+    pipeline = [{'$unwind': '$cards'},
+                {'$unwind': '$cards.redactions'},
+                {'$group': {'_id': '$cards.redactions.prices.sid'}}]
+    added = 0
+    sids = []
+    for dict_obj in db.list.aggregate(pipeline, allowDiskUse=True):
+        if dict_obj['_id'] is not None:
+            sids.append(dict_obj['_id'])
+        if len(sids) >= batch_size:
+            added += _add_catalog_sids(sids)
+            sids = []
+
+    return added + (_add_catalog_sids(sids) if sids else 0)
+
+
+def _add_catalog_sids(sids):
+    db = get_db()
+
+    bulk = db.sid_prices.initialize_unordered_bulk_op()
+    for sid in sids:
+        bulk.find({'sid': sid}).upsert().update({'$setOnInsert': {'fetched_at': datetime.utcfromtimestamp(0)}})
+    return bulk.execute()['nUpserted']
+
+
+def get_stale_sids(number, skipped=None):
+    """Returns sids which prices are older than ttl, the oldest first
+
+    :param number: max number of sids
+    :param skipped: list of sids that aren't returned, e.g. which requests failed
+    :return: list of sids
+    """
+    db = get_db()
+
+    query_filter = {'fetched_at': {'$lt': datetime.utcnow() - CARD_PRICES_TTL}}
+    if skipped:
+        query_filter['sid'] = {'$nin': skipped}
+    return [dict_obj['sid'] for dict_obj in
+            db.sid_prices.find(query_filter, {'sid': 1}).sort('fetched_at', pymongo.ASCENDING).limit(number)]
+
+
+def mark_stale_summaries(sids):
+    """Changes revision of lists which have cards redactions with any of sids and marks their summaries as stale
+    with one update, summaries are recalculated later by get_last_cards_lists or prices refresher
+
+    :param sids: list of tcg sids which prices are changed
     """
-    Converts dict to models.Card
+    db = get_db()
+
+    db.list.update({'cards.redactions.prices.sid': {'$in': sids}},
+                   {'$set': {'rev': ObjectId(), 'summary_stale': True}}, multi=True)
+
+
+def get_stale_summaries_tokens(number):
+    """Returns tokens of lists which summaries are stale
+
+    :param number: max number of tokens
+    :return: list of tokens
+    """
+    db = get_db()
+
+    return [dict_obj['token'] for dict_obj in db.list.find({'summary_stale': True}, {'token': 1}).limit(number)]
+
+
+def get_shop_offers(shop, names):
+    """Searches cached shop offers of cards
+
+    :param shop: shop name
+    :param names: list of card names
+    :return: dict {normalized card name: tuple (list of dict offers, True if offers are fresh)}
+    """
+    db = get_db()
+
+    fresh_after = datetime.utcnow() - SHOP_OFFERS_TTL
+    keys = list(set([ext.normalize_name(name) for name in names]))
+    return dict([(dict_obj['key'], (dict_obj['offers'], dict_obj['checked_at'] >= fresh_after))
+                 for dict_obj in db.shop_offers.find({'shop': shop, 'key': {'$in': keys}})])
+
+
+def save_shop_offers(shop, name, offers):
+    """Saves offers of card found in shop
+
+    :param shop: shop name
+    :param name: card name
+    :param offers: list of models.ShopOffer
+    """
+    db = get_db()
+
+    key = ext.normalize_name(name)
+    dict_offers = [{'url': o.url, 'number': o.number, 'price': o.price, 'type': o.type} for o in offers]
+    db.shop_offers.update({'shop': shop, 'key': key},
+                          {'shop': shop, 'key': key, 'offers': dict_offers, 'checked_at': datetime.utcnow()},
+                          upsert=True)
+
+
+def enqueue_job(token, kind='tcg'):
+    """Adds job for token if there is no queued or running one
+
+    :param token: cards list token
+    :param kind: type of job
+    """
+    db = get_db()
+
+    now = datetime.utcnow()
+    try:
+        db.jobs.update({'token': token, 'kind': kind, 'active': True},
+                       {'$setOnInsert': {'status': 'queued', 'attempts': 0, 'created_at': now, 'lease_until': now}},
+                       upsert=True)
+    except errors.DuplicateKeyError:
+        # concurrent call has inserted the job
+        pass
+
+
+def lease_job(worker_id):
+    """Atomically takes the oldest queued job or job which lease is expired
+
+    :param worker_id: id of worker that takes job
+    :return: dict with job or None
     """
-    redas = [toreda(r) for r in dict_card['redactions']]
-    return models.Card(dict_card['name'], dict_card['number'], redactions=redas)
+    db = get_db()
 
+    now = datetime.utcnow()
+    return db.jobs.find_one_and_update(
+        {'$or': [{'status': 'queued'}, {'status': 'leased', 'lease_until': {'$lt': now}}],
+         'attempts': {'$lt': JOB_MAX_ATTEMPTS}},
+        {'$set': {'status': 'leased', 'worker': worker_id, 'lease_until': now + JOB_LEASE}, '$inc': {'attempts': 1}},
+        sort=[('created_at', pymongo.ASCENDING)],
+        return_document=pymongo.ReturnDocument.AFTER)
 
-def toreda(dict_reda):
+
+def extend_job_lease(job_id, worker_id):
+    """Prolongs lease of running job
+
+    :return: False if job was taken by another worker
     """
-    Converts dict to models.Redaction
+    db = get_db()
+
+    result = db.jobs.update({'_id': job_id, 'worker': worker_id, 'status': 'leased'},
+                            {'$set': {'lease_until': datetime.utcnow() + JOB_LEASE}})
+    return result['n'] > 0
+
+
+def complete_job(job_id, worker_id):
+    """
+    Marks job done if it is still leased by worker
     """
-    info = models.CardInfo(**dict_reda['info']) if 'info' in dict_reda and dict_reda['info'] else None
-    prices = models.CardPrices(**dict_reda['prices']) if 'prices' in dict_reda and dict_reda['prices'] else None
-    return models.Redaction(dict_reda['name'], info=info, prices=prices)
+    db = get_db()
+
+    db.jobs.update({'_id': job_id, 'worker': worker_id},
+                   {'$set': {'status': 'done', 'lease_until': None}, '$unset': {'active': ''}})
+
 
+def requeue_expired_jobs():
+    """Returns jobs of dead workers to queue, jobs that failed too many times are marked as failed
 
-def tooffer(dict_offer):
+    :return: number of requeued jobs
     """
-    Converts dict to models.TCGCardOffer
+    db = get_db()
+
+    expired = {'status': 'leased', 'lease_until': {'$lt': datetime.utcnow()}}
+    db.jobs.update(dict(expired, attempts={'$gte': JOB_MAX_ATTEMPTS}),
+                   {'$set': {'status': 'failed'}, '$unset': {'active': ''}}, multi=True)
+    result = db.jobs.update(expired, {'$set': {'status': 'queued'}}, multi=True)
+    return result['n']
+
+
+def get_queued_jobs_num():
     """
-    return {'seller': models.TCGSeller(**dict_offer['seller']),
-            'offers': [models.TCGCardOffer(**dbcoff) for dbcoff in dict_offer['offers']]}
+    Returns number of jobs that wait for worker
+    """
+    db = get_db()
+
+    return db.jobs.find({'status': 'queued'}).count()
 
 
-def toentry(dict_entry):
+def save_worker(worker_id):
     """
-    Converts dict to models.TaskEntry
+    Registers worker or updates its heartbeat
     """
-    offers = [tooffer(off) for off in dict_entry['offers']] if 'offers' in dict_entry and dict_entry['offers'] else None
-    return models.TaskEntry(dict_entry['card_name'], dict_entry['card_reda'], dict_entry['card_sid'],
-                            dict_entry['status'], offers=offers)
+    db = get_db()
 
+    db.workers.update({'worker': worker_id}, {'$set': {'heartbeat_at': datetime.utcnow()}}, upsert=True)
 
-def totask(dict_task):
+
+def delete_worker(worker_id):
     """
-    Converts dict to models.Task
+    Removes worker from registry
     """
-    entries = [toentry(dbe) for dbe in dict_task['entries']] if 'entries' in dict_task and dict_task['entries'] else None
-    return models.Task(dict_task['token'], dict_task['status'], entries=entries)
+    db = get_db()
+
+    db.workers.remove({'worker': worker_id})
 
 
-def todict(obj, classkey=None):
+def get_alive_workers_num():
     """
-    Converts object graph to dict structures
+    Returns number of workers which heartbeat is not expired
     """
-    if isinstance(obj, dict):
-        for k in obj.keys():
-            obj[k] = todict(obj[k], classkey)
-        return obj
-    elif hasattr(obj, "__iter__"):
-        return [todict(v, classkey) for v in obj]
-    elif hasattr(obj, "__dict__"):
-        data = dict([(key, todict(value, classkey))
-                     for key, value in obj.__dict__.iteritems()
-                     if not callable(value) and not key.startswith('_')])
-        if classkey is not None and hasattr(obj, "__class__"):
-            data[classkey] = obj.__class__.__name__
-        return data
-    else:
-        return obj
+    db = get_db()
+
+    return db.workers.find({'heartbeat_at': {'$gte': datetime.utcnow() - WORKER_TTL}}).count()
+
+
+metrics.instrument_queries(globals())
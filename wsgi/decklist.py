@@ -0,0 +1,160 @@
+import csv
+import itertools
+import os
+import re
+import ext
+
+MAX_BYTES = int(os.environ.get('DECKLIST_MAX_BYTES', str(2 * 1024 * 1024)))
+MAX_LINE_LENGTH = int(os.environ.get('DECKLIST_MAX_LINE_LENGTH', '1024'))
+MAX_RECORDS = int(os.environ.get('DECKLIST_MAX_RECORDS', '5000'))
+MAX_CARD_NUMBER = int(os.environ.get('DECKLIST_MAX_CARD_NUMBER', '1000'))
+
+UTF8_BOM = '\xef\xbb\xbf'
+MAIN_SECTION_RE = re.compile(r'^(//\s*)?(main\s*deck|main\s*board|main|deck|commander)\s*:?$', re.IGNORECASE)
+SIDEBOARD_SECTION_RE = re.compile(r'^(//\s*)?(side\s*board|sb)\s*:?$', re.IGNORECASE)
+SIDEBOARD_PREFIX_RE = re.compile(r'^SB:\s*', re.IGNORECASE)
+COMMENT_RE = re.compile(r'^(//|#)')
+# 4 Name, 4x Name, 4 x Name, 4 [M10] Name
+NUMBER_FIRST_RE = re.compile(r'^(\d+)\s*[xX]?\s+(?:\[[^\]]*\]\s*)?(.+)$')
+# Name 4, Name x4, Name;4
+NUMBER_LAST_RE = re.compile(r'^(.+?)[\s;,]+[xX]?(\d+)$')
+# set code and collector number of Arena export, like (M10) 146
+SET_SUFFIX_RE = re.compile(r'\s+\([A-Za-z0-9]{2,6}\)\s+\S+$')
+
+CSV_NAME_COLUMNS = ['name', 'card name', 'card']
+CSV_NUMBER_COLUMNS = ['count', 'quantity', 'qty', 'number', 'amount']
+
+
+class DecklistError(ValueError):
+    """
+    Uploaded list is too big or has wrong structure
+    """
+    pass
+
+
+def parse_line(line):
+    """Parses one line of text list, number could be before or after name, 1 if there is no number
+
+    :param line: stripped not empty line
+    :return: dict {name, number}
+    """
+    line = SIDEBOARD_PREFIX_RE.sub('', line)
+
+    match = NUMBER_FIRST_RE.match(line)
+    if match:
+        number, name = match.groups()
+    else:
+        match = NUMBER_LAST_RE.match(line)
+        name, number = match.groups() if match else (line, '1')
+
+    name = SET_SUFFIX_RE.sub('', name).strip(' \t;')
+    return make_record(name, number)
+
+
+def make_record(name, number):
+    """Checks parsed values
+
+    :return: dict {name, number}
+    """
+    if not name:
+        raise DecklistError('card name is empty')
+
+    number = int(number)
+    if not 0 < number <= MAX_CARD_NUMBER:
+        raise DecklistError('wrong number %d of card %s' % (number, name))
+
+    return {'name': name, 'number': number}
+
+
+class DecklistReader(object):
+    """Reads cards records from file-like object line by line.
+    Understands MTGO .dec, '4x Name', 'Name 4' and CSV with header, cards of sideboard are bought too,
+    so they are read as cards of main deck.
+
+    DecklistError is raised from iteration, so list should be read before its cards are resolved.
+    Upload reads all records first, they aren't resolved while list is read.
+    """
+
+    def __init__(self, stream, max_bytes=MAX_BYTES, max_records=MAX_RECORDS):
+        self.stream = stream
+        self.max_bytes = max_bytes
+        self.max_records = max_records
+
+        self.bytes_read = 0
+        self.records_num = 0
+
+    def __iter__(self):
+        for record in self._read_records():
+            self.records_num += 1
+            if self.records_num > self.max_records:
+                raise DecklistError('list has more than %d records' % self.max_records)
+
+            yield record
+
+    def _read_lines(self):
+        """
+        Yields lines of stream with line endings, checks size limits
+        """
+        is_first = True
+        while True:
+            line = self.stream.readline(MAX_LINE_LENGTH + 1)
+            if not line:
+                return
+
+            self.bytes_read += len(line)
+            if self.bytes_read > self.max_bytes:
+                raise DecklistError('list is bigger than %d bytes' % self.max_bytes)
+            if len(line) > MAX_LINE_LENGTH:
+                raise DecklistError('line is longer than %d bytes' % MAX_LINE_LENGTH)
+
+            if is_first and line.startswith(UTF8_BOM):
+                line = line[len(UTF8_BOM):]
+            is_first = False
+
+            yield line
+
+    def _read_records(self):
+        lines = self._read_lines()
+        for line in lines:
+            if not line.strip():
+                continue
+
+            lines = itertools.chain([line], lines)
+            header = [column.strip().lower() for column in next(csv.reader([line]))]
+            if len(header) > 1 and set(header) & set(CSV_NAME_COLUMNS):
+                return self._read_csv(lines)
+
+            return self._read_text(lines)
+
+        return iter([])
+
+    def _read_text(self, lines):
+        for line in lines:
+            line = line.strip(' \t\r\n')
+            if not line or MAIN_SECTION_RE.match(line) or SIDEBOARD_SECTION_RE.match(line) or COMMENT_RE.match(line):
+                continue
+
+            yield parse_line(line)
+
+    def _read_csv(self, lines):
+        try:
+            rows = csv.reader(lines)
+            header = [column.strip().lower() for column in next(rows)]
+            name_index = self._get_column(header, CSV_NAME_COLUMNS)
+            number_index = self._get_column(header, CSV_NUMBER_COLUMNS)
+
+            for row in rows:
+                if not any(row):
+                    continue
+
+                yield make_record(self._get_cell(row, name_index), self._get_cell(row, number_index) or '1')
+        except DecklistError:
+            raise
+        except (csv.Error, ValueError) as e:
+            raise DecklistError('wrong csv structure: %s' % e)
+
+    def _get_column(self, header, names):
+        return ext.get_first(range(len(header)), lambda i: header[i] in names)
+
+    def _get_cell(self, row, index):
+        return row[index].strip() if index is not None and index < len(row) else ''
@@ -1,11 +1,12 @@
 # coding=utf-8
-import io
+import collections
 import random
 import re
 import string
-import cStringIO
 import itertools
+import threading
 import urlparse
+import weakref
 
 
 def get_token(size=6, chars=string.ascii_lowercase + string.digits):
@@ -21,6 +22,13 @@ def uni(value):
     return value.strip().lower()
 
 
+def normalize_name(name):
+    """
+    Makes card name unicode, lowers it and collapses whitespaces
+    """
+    return u' '.join(uni(name).split())
+
+
 def urlEncodeNonAscii(b):
     """
     Replaces non ascii symbols with encoded
@@ -73,18 +81,18 @@ def result_or_default(func, default=None, prevent_empty=False):
 
 def get_domain(url):
     """
-    Returns hostname with scheme
+    Returns hostname with scheme and port if it is specified
     """
     decomposed = urlparse.urlparse(url)
-    return decomposed.scheme + '://' + decomposed.hostname
+    return decomposed.scheme + '://' + decomposed.netloc
 
 
 def get_domain_with_path(url):
     """
-    Returns hostname with scheme and path
+    Returns hostname with scheme, port and path
     """
     decomposed = urlparse.urlparse(url)
-    return decomposed.scheme + '://' + decomposed.hostname + decomposed.path
+    return decomposed.scheme + '://' + decomposed.netloc + decomposed.path
 
 
 def get_query_string_params(url):
@@ -101,62 +109,55 @@ def url_join(base, url):
     return urlparse.urljoin(base, url)
 
 
-def parse_card(line):
-    """parse_card(line) -> (string, string)
-
-    Parses input line to find card name and cards number.
-    If no cards number found, returns 1.
+def merge_pups(cards):
+    """Sums number for the same cards
 
-    :param line: input string
-    :return: dict {card name, cards number}
+    :param cards: list of models.Card
+    :return: list of models.Card in order of their first appearance
     """
+    unique_cards = collections.OrderedDict()
+    for card in cards:
+        if card.name in unique_cards:
+            unique_cards[card.name].number += card.number
+        else:
+            unique_cards[card.name] = card
 
-    length = len(line)
-    number = ''
-
-    current_pos = length - 1
-    while line[current_pos].isdigit():
-        number = line[current_pos] + number
-        current_pos -= 1
-
-    if not number:
-        number = '1'
-
-    name = line[:current_pos].strip(' \t\r;')
-
-    return {'name': name, 'number': int(number)}
-
-
-def read_file(stream):
-    """read_file(stream) -> list of (string, string)
+    return unique_cards.values()
 
-    Parses input stream and returns list of cards names and cards numbers
 
-    :return: list of tuples (card name, card number)
+class ThreadDict(dict):
+    """
+    Dict of one OS thread, it could be referenced weakly
     """
-    if isinstance(stream, cStringIO.OutputType) or isinstance(stream, io.BytesIO):
-        full_content = stream.getvalue()
-        stripped_lines = [l.strip(' \t\r') for l in full_content.split('\n')]
-        cards = [parse_card(card) for card in stripped_lines if card]
+    pass
 
-        return cards
 
-    raise IOError('unknown input stream format encountered, type: %s' % type(stream))
+class ThreadDicts(object):
+    """Keeps dict per OS thread, green threads of one OS thread share it.
+    Eventlet objects work only in hub of their thread, so they are kept in these dicts.
+    Dicts of alive threads are available for stats.
+    """
 
+    def __init__(self):
+        self._local = threading.local()
+        self._dicts = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
 
-def merge_pups(cards):
-    """Sums number for the same cards
+    def get(self):
+        """
+        Returns dict of current thread
+        """
+        thread_dict = getattr(self._local, 'dict', None)
+        if thread_dict is None:
+            thread_dict = self._local.dict = ThreadDict()
+            with self._lock:
+                self._dicts[id(thread_dict)] = thread_dict
 
-    :param cards: list of models.Card
-    :return: list of models.Card
-    """
-    unique_cards = set()
-    for card in cards:
-        if card not in unique_cards:
-            unique_cards.add(card)
-        else:
-            for set_card in unique_cards:
-                if set_card == card:
-                    set_card.number += card.number
+        return thread_dict
 
-    return list(unique_cards)
\ No newline at end of file
+    def get_all(self):
+        """
+        Returns list of dicts of all alive threads
+        """
+        with self._lock:
+            return self._dicts.values()
@@ -1,4 +1,5 @@
 import random
+import prices
 
 
 def price_sum(cards, prop):
@@ -8,7 +9,7 @@ def price_sum(cards, prop):
     :param prop: price that will be summed (low, mid, high)
     :return: sum as float number
     """
-    return sum([card.get_avg_prices()[prop] * card.number for card in cards if card.is_resolved])
+    return prices.get_matrix(cards).total(prop)
 
 
 def price_str_to_float(string):
@@ -0,0 +1,196 @@
+import bisect
+import functools
+import os
+import threading
+import time
+import jinja2
+from flask import g, request
+
+METRICS_ENABLED = os.environ.get('METRICS', 'on') != 'off'
+# upper bounds of histogram buckets in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# name: (help, label names)
+METRICS = {
+    'http_request_seconds': ('Time of flask route', ('route', 'status')),
+    'template_render_seconds': ('Time of jinja template rendering', ('template',)),
+    'scraper_request_seconds': ('Time of openurl call', ('host', 'scraper', 'result')),
+    'db_query_seconds': ('Time of db.py function', ('function',)),
+}
+
+
+class Histogram(object):
+    """Counts observations by buckets, counters are preallocated, so observation doesn't allocate.
+    Counters aren't locked, green threads can't interrupt increment.
+    """
+    __slots__ = ('counts', 'sum')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+
+
+class Registry(object):
+    """
+    Histograms of metrics by their label values and gauges read from stats of components
+    """
+
+    def __init__(self):
+        self._series = dict([(name, {}) for name in METRICS])
+        self._gauges = []
+        self._lock = threading.Lock()
+
+    def get(self, name, labels):
+        """Returns histogram of metric, it is created on the first use of labels
+
+        :param name: metric name from METRICS
+        :param labels: tuple of label values in order of metric label names
+        :return: Histogram
+        """
+        series = self._series[name]
+        histogram = series.get(labels)
+        if histogram is None:
+            with self._lock:
+                histogram = series.setdefault(labels, Histogram())
+
+        return histogram
+
+    def observe(self, name, labels, seconds):
+        if METRICS_ENABLED:
+            self.get(name, labels).observe(seconds)
+
+    def add_gauges(self, prefix, get_stats, label=None):
+        """Adds gauges which values are read from stats when metrics are rendered
+
+        :param prefix: prefix of gauges names
+        :param get_stats: function that returns dict {name: number},
+                          if label is set dict {label value: dict {name: number}}
+        :param label: name of label of stats groups or None
+        """
+        self._gauges.append((prefix, get_stats, label))
+
+    def render(self):
+        """
+        Returns metrics in prometheus text format
+        """
+        lines = []
+        for name in sorted(self._series):
+            help_text, label_names = METRICS[name]
+            lines.append('# HELP %s %s' % (name, help_text))
+            lines.append('# TYPE %s histogram' % name)
+            for labels, histogram in sorted(self._series[name].items()):
+                pairs = ['%s="%s"' % (label, escape(value)) for label, value in zip(label_names, labels)]
+                total = 0
+                for bound, count in zip(BUCKETS + ('+Inf',), histogram.counts):
+                    total += count
+                    lines.append('%s_bucket{%s} %d' % (name, ','.join(pairs + ['le="%s"' % bound]), total))
+                lines.append('%s_sum{%s} %f' % (name, ','.join(pairs), histogram.sum))
+                lines.append('%s_count{%s} %d' % (name, ','.join(pairs), total))
+
+        for prefix, get_stats, label in self._gauges:
+            lines.extend(render_gauges(prefix, get_stats(), label))
+
+        return '\n'.join(lines) + '\n'
+
+
+def render_gauges(prefix, stats, label=None):
+    """Returns lines of gauges in prometheus text format, values that aren't numbers are skipped
+
+    :param prefix: prefix of gauges names
+    :param stats: dict {name: number} or dict {label value: dict {name: number}} if label is set
+    :param label: name of label of stats groups or None
+    :return: list of strings
+    """
+    groups = sorted(stats.items()) if label else [(None, stats)]
+    values = {}
+    for label_value, group in groups:
+        pairs = '{%s="%s"}' % (label, escape(label_value)) if label else ''
+        for name, value in group.items():
+            if isinstance(value, (int, long, float)):
+                values.setdefault(name, []).append('%s_%s%s %s' % (prefix, name, pairs, float(value)))
+
+    lines = []
+    for name in sorted(values):
+        lines.append('# TYPE %s_%s gauge' % (prefix, name))
+        lines.extend(values[name])
+
+    return lines
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = Registry()
+
+
+def instrument_queries(namespace):
+    """Wraps functions of module which use db connection, so their calls are timed by function name
+
+    :param namespace: globals of module
+    """
+    if not METRICS_ENABLED:
+        return
+
+    for name, func in namespace.items():
+        if callable(func) and getattr(func, '__module__', None) == namespace['__name__'] \
+                and hasattr(func, 'func_code') and 'get_db' in func.func_code.co_names:
+            namespace[name] = timed(func, registry.get('db_query_seconds', (name,)))
+
+
+def timed(func, histogram):
+    """
+    Wraps function, so its calls are observed by histogram
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            histogram.observe(time.time() - start)
+
+    return wrapper
+
+
+class TimedTemplate(jinja2.Template):
+    """
+    Template which top level rendering is timed by template name
+    """
+
+    def render(self, *args, **kwargs):
+        start = time.time()
+        try:
+            return jinja2.Template.render(self, *args, **kwargs)
+        finally:
+            registry.observe('template_render_seconds', (self.name,), time.time() - start)
+
+
+def register(app):
+    """
+    Times routes and templates of flask application
+    """
+    if not METRICS_ENABLED:
+        return
+
+    app.jinja_env.template_class = TimedTemplate
+    app.before_request(_start_request)
+    app.after_request(_observe_request)
+
+
+def _start_request():
+    g.request_started_at = time.time()
+
+
+def _observe_request(response):
+    started_at = getattr(g, 'request_started_at', None)
+    if started_at is not None:
+        registry.observe('http_request_seconds', (request.endpoint or 'unknown', response.status_code),
+                         time.time() - started_at)
+
+    return response
@@ -1,5 +1,42 @@
-import ext
-import numpy
+import array
+import bisect
+import heapq
+import itertools
+
+
+class LazyList(object):
+    """Read-only list of db dicts which are converted to models on the first access of each of them,
+    so views that don't read items don't pay for their deserialization
+    """
+    __slots__ = ('_items', '_convert', '_converted')
+
+    def __init__(self, items, convert):
+        self._items = items
+        self._convert = convert
+        self._converted = [None] * len(items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __nonzero__(self):
+        return len(self._items) > 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in xrange(*index.indices(len(self._items)))]
+
+        item = self._converted[index]
+        if item is None:
+            item = self._converted[index] = self._convert(self._items[index])
+
+        return item
+
+    def __iter__(self):
+        for i in xrange(len(self._items)):
+            yield self[i]
+
+    def __repr__(self):
+        return repr(list(self))
 
 
 class Card(object):
@@ -21,15 +58,6 @@ class Card(object):
         return self.redactions[0].info.description \
             if self.redactions is not None and len(self.redactions) > 1 else None
 
-    def get_avg_prices(self):
-        """
-        Returns average prices among redactions
-        """
-        avg_prices = {}
-        for prop in ['low', 'mid', 'high']:
-            avg_prices[prop] = numpy.median([reda.prices.__dict__[prop] for reda in self.redactions])
-        return avg_prices
-
     def __hash__(self):
         return hash(self.name)
 
@@ -95,16 +123,18 @@ class CardsList(object):
     Represents cards list with summary info
     """
 
-    def __init__(self, token, cards_num, price):
+    def __init__(self, token, cards_num, price, created_at=None):
         self.token = token
         self.cards_num = cards_num
         self.price = price
+        self.created_at = created_at
 
 
 class TCGCardOffer(object):
     """
     Represents tcg seller for specific card
     """
+    __slots__ = ('sid', 'condition', 'number', 'price')
 
     def __init__(self, sid, condition, number, price):
         self.sid = sid
@@ -115,9 +145,13 @@ class TCGCardOffer(object):
     def get_redaction(self, cards):
         """Finds card redaction for this card offer
 
-        :param cards: list of models.Card
+        :param cards: list of models.Card, sid index of prices.PricedCards is used if there is one
         :return: models.Redaction
         """
+        index = getattr(cards, 'redactions_index', None)
+        if index is not None:
+            return index.get(self.sid)
+
         for card in cards:
             for reda in card.redactions:
                 if reda.prices.sid == self.sid:
@@ -130,65 +164,103 @@ class TCGCardOffer(object):
 
 
 class TCGCardOffersList(object):
+    """Represents list of offers for card. Offers are sorted by price once after they are added,
+    with prefix sums of their numbers and costs, so cost of any number of cards is found by binary search.
     """
-    Represents list of offers for card
-    """
+    __slots__ = ('card', '_offers', '_sorted', '_numbers', '_costs')
 
     def __init__(self, card):
         self.card = card
         self._offers = []
+        self._sorted = None
+        # numbers[i] and costs[i] are number and cost of all cards of offers sorted[:i + 1]
+        self._numbers = None
+        self._costs = None
 
     @property
     def offers(self):
         """
         Offers list sorted by price lower to higher
         """
-        return sorted(self._offers, key=lambda o: o.price)
+        if self._sorted is None:
+            self._build()
+
+        return self._sorted
+
+    @property
+    def offered_num(self):
+        """
+        Returns number of cards in all offers
+        """
+        if self._sorted is None:
+            self._build()
+
+        return self._numbers[-1] if self._numbers else 0
 
     @property
     def available_card_num(self):
         """
         Returns number of cards available to purchase
         """
-        available = sum([o.number for o in self._offers])
-        return self.card.number if available > self.card.number else available
+        return min(self.card.number, self.offered_num)
 
     @property
     def card_cost(self):
         """
         Returns card cost if you will buy it
         """
-        cost = 0.0
-        bought = 0
-        for offer in self.offers:
-            need_cards = self.card.number - bought
-            available_cards = offer.number
-
-            buy_cards = need_cards if available_cards > need_cards else available_cards
-            bought += buy_cards
-            cost += buy_cards * offer.price
-
-            if bought == self.card.number:
-                break
-
-        return cost
+        return self.get_cost(self.card.number)
 
     @property
     def card_is_available(self):
         return self.card.number == self.available_card_num
 
+    def get_cost(self, number):
+        """Returns cost of the cheapest cards, all offered cards are bought if there are less of them
+
+        :param number: number of cards to buy
+        :return: cost as float
+        """
+        if self._sorted is None:
+            self._build()
+
+        if number <= 0 or not self._numbers:
+            return 0.0
+
+        i = bisect.bisect_left(self._numbers, number)
+        if i == len(self._numbers):
+            return self._costs[-1]
+
+        bought = self._numbers[i - 1] if i else 0
+        cost = self._costs[i - 1] if i else 0.0
+        return cost + (number - bought) * self._sorted[i].price
+
     def add_offer(self, offer):
         """Adds new offer
 
         :param offer: models.TCGCardOffer object
         """
         self._offers.append(offer)
+        self._sorted = None
+
+    def _build(self):
+        self._sorted = sorted(self._offers, key=lambda o: o.price)
+        self._numbers = array.array('l')
+        self._costs = array.array('d')
+
+        number, cost = 0, 0.0
+        for offer in self._sorted:
+            number += offer.number
+            cost += offer.number * offer.price
+            self._numbers.append(number)
+            self._costs.append(cost)
 
 
 class TCGSeller(object):
     """
     Represents seller that has several cards
     """
+    __slots__ = ('name', 'url', 'rating', 'sales', '_card_offers_lists', '_card_offers_index')
 
     def __init__(self, name, url, rating, sales):
         self.name = name
@@ -196,6 +268,7 @@ class TCGSeller(object):
         self.rating = rating
         self.sales = sales
         self._card_offers_lists = []
+        self._card_offers_index = {}
 
     @property
     def card_offers_lists(self):
@@ -221,10 +294,11 @@ class TCGSeller(object):
         """
         Adds new card to cards list or if such already added, adds only offer info
         """
-        card_offers_list = ext.get_first(self._card_offers_lists, lambda col: col.card.name == card.name)
+        card_offers_list = self._card_offers_index.get(card.name)
         if card_offers_list is None:
             card_offers_list = TCGCardOffersList(card)
             self._card_offers_lists.append(card_offers_list)
+            self._card_offers_index[card.name] = card_offers_list
 
         card_offers_list.add_offer(offer)
 
@@ -232,7 +306,7 @@ class TCGSeller(object):
         """
         Returns cards offers list for specified card or returns None if there no offers
         """
-        return ext.get_first(self._card_offers_lists, lambda c: c.card.name == card.name)
+        return self._card_offers_index.get(card.name)
 
     def has_all_cards(self, cards):
         """
@@ -250,6 +324,61 @@ class TCGSeller(object):
         return self.name + ' ' + len(self._card_offers_lists)
 
 
+class TCGSellersRegistry(object):
+    """
+    Aggregates tcg sellers with their card offers from task entries
+    """
+
+    def __init__(self, cards):
+        self._cards_index = dict([(card.name, card) for card in cards])
+        self._sellers = []
+        self._sellers_index = {}
+
+    @property
+    def sellers(self):
+        return self._sellers
+
+    def add_entry(self, entry):
+        """Adds offers of parsed task entry to sellers
+
+        :param entry: models.TaskEntry object
+        """
+        card = self._cards_index.get(entry.card_name)
+        if card is None or not entry.offers:
+            return
+
+        for seller_offers in entry.offers:
+            seller = self.get_seller(seller_offers['seller'])
+            for offer in seller_offers['offers']:
+                seller.add_card_offer(card, offer)
+
+    def get_seller(self, seller):
+        """Returns registered seller that equals to specified or registers it
+
+        :param seller: models.TCGSeller object
+        :return: models.TCGSeller object
+        """
+        registered = self._sellers_index.get((seller.name, seller.url))
+        if registered is None:
+            registered = seller
+            self._sellers.append(seller)
+            self._sellers_index[(seller.name, seller.url)] = seller
+
+        return registered
+
+    def top(self, number, key, reverse=False, condition=None):
+        """Returns first sellers ordered by key without sorting all of them
+
+        :param number: number of sellers to return
+        :param key: function that returns value to order by
+        :param reverse: if True, sellers with the biggest values are returned
+        :param condition: function that filters sellers
+        :return: list of models.TCGSeller
+        """
+        sellers = self._sellers if condition is None else itertools.ifilter(condition, self._sellers)
+        return heapq.nlargest(number, sellers, key=key) if reverse else heapq.nsmallest(number, sellers, key=key)
+
+
 class ShopOffer(object):
     """
     Represents card offer from www.buymagic.ua
@@ -293,4 +422,61 @@ class TaskEntry(object):
         self.offers = offers
 
     def __repr__(self):
-        return '%s - %s [%s]' % (self.card_name, self.card_reda, self.status)
\ No newline at end of file
+        return '%s - %s [%s]' % (self.card_name, self.card_reda, self.status)
+
+
+class CartSeller(object):
+    """
+    Represents seller chosen for cart with cards that should be bought from him
+    """
+
+    def __init__(self, seller):
+        self.seller = seller
+        self.items = []
+
+    @property
+    def cards_num(self):
+        return sum([number for card, offer, number in self.items])
+
+    @property
+    def cards_cost(self):
+        return sum([number * offer.price for card, offer, number in self.items])
+
+    def add_item(self, card, offer, number):
+        """Adds offer that should be bought
+
+        :param card: models.Card object
+        :param offer: models.TCGCardOffer object
+        :param number: number of cards bought by this offer
+        """
+        self.items.append((card, offer, number))
+
+    def __repr__(self):
+        return '%s x %d' % (self.seller.name, self.cards_num)
+
+
+class Cart(object):
+    """
+    Represents cards list split between several tcg sellers
+    """
+
+    def __init__(self, sellers, shipping_cost, missing=None, search_finished=False):
+        self.sellers = sellers
+        self.shipping_cost = shipping_cost
+        self.missing = missing if missing else {}
+        self.search_finished = search_finished
+
+    @property
+    def cards_cost(self):
+        return sum([s.cards_cost for s in self.sellers])
+
+    @property
+    def total_cost(self):
+        return self.cards_cost + self.shipping_cost * len(self.sellers)
+
+    @property
+    def is_complete(self):
+        return not self.missing
+
+    def __repr__(self):
+        return '%d sellers $%0.2f' % (len(self.sellers), self.total_cost)
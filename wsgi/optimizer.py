@@ -0,0 +1,268 @@
+import heapq
+import os
+import time
+import models
+
+SHIPPING_COST = float(os.environ.get('CART_SHIPPING_COST', '1.0'))
+MAX_SELLERS = int(os.environ.get('CART_MAX_SELLERS', '8'))
+TIME_BUDGET = float(os.environ.get('CART_TIME_BUDGET', '0.3'))
+
+# number of the most useful sellers that take part in exhaustive search
+SEARCH_POOL_SIZE = 20
+# price of a card that couldn't be bought, makes covering of the list more important than price
+MISSING_PENALTY = 10000.0
+
+
+def optimize_cart(task, cards, shipping_cost=SHIPPING_COST, max_sellers=MAX_SELLERS, time_budget=TIME_BUDGET):
+    """Finds the cheapest split of cards list between tcg sellers
+
+    :param task: models.Task object with parsed offers
+    :param cards: list of models.Card objects
+    :param shipping_cost: cost of one order, paid for each chosen seller
+    :param max_sellers: max number of sellers in cart
+    :param time_budget: seconds after which the cheapest found cart is returned
+    :return: models.Cart object
+    """
+    optimizer = CartOptimizer(cards, shipping_cost=shipping_cost, max_sellers=max_sellers, time_budget=time_budget)
+    for entry in task.entries or []:
+        optimizer.add_entry(entry)
+
+    return optimizer.solve()
+
+
+class SearchBudgetExceeded(Exception):
+    """
+    Raised when search for the cheapest cart is out of time
+    """
+    pass
+
+
+class CartOptimizer(object):
+    """Chooses set of sellers that minimizes cards cost plus shipping cost.
+
+    When set of sellers is known, each card is bought from the cheapest offers among them,
+    so the search runs over sets of sellers only: lazy greedy gives first cart,
+    then branch and bound improves it over the most useful sellers until time budget ends.
+    """
+
+    def __init__(self, cards, shipping_cost=SHIPPING_COST, max_sellers=MAX_SELLERS, time_budget=TIME_BUDGET):
+        self.cards = [card for card in cards if card.number > 0]
+        self.shipping_cost = shipping_cost
+        self.max_sellers = max_sellers
+        self.time_budget = time_budget
+
+        self._needs = [card.number for card in self.cards]
+        self._cards_index = dict([(card.name, i) for i, card in enumerate(self.cards)])
+        self._sellers = []
+        self._sellers_index = {}
+        self._offers = []
+        self._units = []
+        self._deadline = None
+
+    def add_entry(self, entry):
+        """Adds offers of parsed task entry
+
+        :param entry: models.TaskEntry object
+        """
+        card_index = self._cards_index.get(entry.card_name)
+        if card_index is None or not entry.offers:
+            return
+
+        for seller_offers in entry.offers:
+            seller = seller_offers['seller']
+            seller_index = self._sellers_index.get((seller.name, seller.url))
+            if seller_index is None:
+                seller_index = len(self._sellers)
+                self._sellers_index[(seller.name, seller.url)] = seller_index
+                self._sellers.append(seller)
+                self._offers.append({})
+
+            self._offers[seller_index].setdefault(card_index, []).extend(seller_offers['offers'])
+
+    def solve(self):
+        """Searches the cheapest cart
+
+        :return: models.Cart object
+        """
+        self._deadline = time.time() + self.time_budget
+        self._units = [self._get_units(offers) for offers in self._offers]
+
+        gains = [self._get_gain(units, [[] for _ in self._needs]) for units in self._units]
+        chosen = self._drop_redundant(self._choose_greedy(gains))
+        best = [self._evaluate(chosen) + self.shipping_cost * len(chosen), chosen]
+
+        pool = set(chosen)
+        for seller_index in heapq.nlargest(SEARCH_POOL_SIZE, xrange(len(gains)), key=lambda j: gains[j]):
+            if gains[seller_index] > 0:
+                pool.add(seller_index)
+        pool = sorted(pool, key=lambda j: gains[j], reverse=True)
+
+        try:
+            self._search(pool, 0, [], best)
+            search_finished = True
+        except SearchBudgetExceeded:
+            search_finished = False
+
+        return self._make_cart(best[1], search_finished)
+
+    def _get_units(self, offers):
+        """Expands seller offers to sorted prices of single cards
+
+        :param offers: dict {card index: list of models.TCGCardOffer}
+        :return: dict {card index: sorted list of prices limited by card need}
+        """
+        units = {}
+        for card_index, card_offers in offers.iteritems():
+            need = self._needs[card_index]
+            prices = []
+            for offer in sorted(card_offers, key=lambda o: o.price) if len(card_offers) > 1 else card_offers:
+                prices.extend([offer.price] * offer.number)
+                if len(prices) >= need:
+                    del prices[need:]
+                    break
+
+            if prices:
+                units[card_index] = prices
+
+        return units
+
+    def _card_cost(self, card_index, prices):
+        return sum(prices) + (self._needs[card_index] - len(prices)) * MISSING_PENALTY
+
+    def _merge(self, card_index, prices, other_prices):
+        return sorted(prices + other_prices)[:self._needs[card_index]]
+
+    def _get_gain(self, units, bought):
+        """Calculates how much cheaper cart becomes if seller will be added
+
+        :param units: seller prices from _get_units
+        :param bought: list of currently bought prices for each card
+        :return: gain as float, negative if seller makes cart more expensive
+        """
+        gain = -self.shipping_cost
+        for card_index, prices in units.iteritems():
+            card_bought = bought[card_index]
+            if len(card_bought) == self._needs[card_index] and card_bought[-1] <= prices[0]:
+                continue
+
+            merged = self._merge(card_index, card_bought, prices)
+            gain += self._card_cost(card_index, card_bought) - self._card_cost(card_index, merged)
+
+        return gain
+
+    def _choose_greedy(self, gains):
+        """Adds sellers one by one while they make cart cheaper.
+        Gain of seller only decreases when cart grows, so stale gains are upper bounds
+        and most of them are never recalculated.
+
+        :param gains: gains of sellers for empty cart
+        :return: list of sellers indexes
+        """
+        bought = [[] for _ in self._needs]
+        heap = [(-gain, j) for j, gain in enumerate(gains) if gain > 0]
+        heapq.heapify(heap)
+
+        chosen = []
+        while heap and len(chosen) < self.max_sellers:
+            _, seller_index = heapq.heappop(heap)
+            gain = self._get_gain(self._units[seller_index], bought)
+            if heap and gain < -heap[0][0]:
+                heapq.heappush(heap, (-gain, seller_index))
+                continue
+
+            if gain <= 0:
+                break
+
+            chosen.append(seller_index)
+            for card_index, prices in self._units[seller_index].iteritems():
+                bought[card_index] = self._merge(card_index, bought[card_index], prices)
+
+        return chosen
+
+    def _drop_redundant(self, chosen):
+        """
+        Removes sellers which shipping costs more than they save
+        """
+        cost = self._evaluate(chosen) + self.shipping_cost * len(chosen)
+        improved = True
+        while improved:
+            improved = False
+            for seller_index in list(chosen):
+                rest = [j for j in chosen if j != seller_index]
+                rest_cost = self._evaluate(rest) + self.shipping_cost * len(rest)
+                if rest_cost < cost:
+                    chosen, cost, improved = rest, rest_cost, True
+
+        return chosen
+
+    def _evaluate(self, sellers):
+        """Calculates cost of cards bought from sellers without shipping
+
+        :param sellers: list of sellers indexes
+        :return: cost as float
+        """
+        card_prices = {}
+        for seller_index in sellers:
+            for card_index, prices in self._units[seller_index].iteritems():
+                card_prices.setdefault(card_index, []).extend(prices)
+
+        cost = 0.0
+        for card_index, need in enumerate(self._needs):
+            prices = sorted(card_prices.get(card_index, []))[:need]
+            cost += self._card_cost(card_index, prices)
+
+        return cost
+
+    def _search(self, pool, position, included, best):
+        """Branch and bound over sellers in pool, updates best [cost, sellers] in place.
+        Cart with all remaining sellers but without their shipping is a lower bound of the branch.
+
+        :param pool: list of sellers indexes
+        :param position: index of seller in pool to decide about
+        :param included: sellers included in current branch
+        :param best: list [cost, sellers] of the cheapest found cart
+        """
+        if time.time() > self._deadline:
+            raise SearchBudgetExceeded()
+
+        shipping = self.shipping_cost * len(included)
+        lower_bound = self._evaluate(included + pool[position:]) + shipping
+        if lower_bound >= best[0]:
+            return
+
+        cost = self._evaluate(included) + shipping
+        if cost < best[0]:
+            best[0], best[1] = cost, list(included)
+
+        if position == len(pool):
+            return
+
+        if len(included) < self.max_sellers:
+            self._search(pool, position + 1, included + [pool[position]], best)
+        self._search(pool, position + 1, included, best)
+
+    def _make_cart(self, sellers, search_finished):
+        """Distributes cards between chosen sellers
+
+        :param sellers: list of sellers indexes
+        :param search_finished: True if cart is the cheapest among searched sellers
+        :return: models.Cart object
+        """
+        cart_sellers = dict([(j, models.CartSeller(self._sellers[j])) for j in sellers])
+
+        missing = {}
+        for card_index, card in enumerate(self.cards):
+            offers = [(offer, j) for j in sellers for offer in self._offers[j].get(card_index, [])]
+            need = card.number
+            for offer, seller_index in sorted(offers, key=lambda o: o[0].price):
+                number = min(offer.number, need)
+                if number > 0:
+                    cart_sellers[seller_index].add_item(card, offer, number)
+                    need -= number
+
+            if need > 0:
+                missing[card] = need
+
+        cart_sellers = [cart_sellers[j] for j in sellers if cart_sellers[j].items]
+        return models.Cart(sorted(cart_sellers, key=lambda s: s.cards_cost, reverse=True), self.shipping_cost,
+                           missing=missing, search_finished=search_finished)
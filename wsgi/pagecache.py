@@ -0,0 +1,97 @@
+import collections
+import hashlib
+import os
+import threading
+
+PAGE_CACHE_ENTRIES = int(os.environ.get('PAGE_CACHE_ENTRIES', '200'))
+PAGE_CACHE_MAX_BYTES = int(os.environ.get('PAGE_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+
+
+def get_etag(key):
+    """Builds etag from page key, key contains revisions of page data,
+    so etag is the same in all processes and is changed with data
+
+    :param key: tuple (token, view, view arguments..., data revisions...)
+    :return: string
+    """
+    return hashlib.sha1(repr(key)).hexdigest()
+
+
+class PageCache(object):
+    """
+    Bounded LRU of rendered pages of cards lists
+    """
+
+    def __init__(self, entries=PAGE_CACHE_ENTRIES, max_bytes=PAGE_CACHE_MAX_BYTES):
+        self.entries = entries
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+
+        self._pages = collections.OrderedDict()
+        self._tokens = collections.defaultdict(set)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns rendered page
+
+        :param key: tuple that starts with list token
+        :return: page body or None
+        """
+        with self._lock:
+            body = self._pages.pop(key, None)
+            if body is None:
+                self.misses += 1
+                return None
+
+            self._pages[key] = body
+            self.hits += 1
+            return body
+
+    def put(self, key, body):
+        """Stores rendered page, least recently used pages are evicted when cache is full
+
+        :param key: tuple that starts with list token
+        :param body: page body
+        """
+        with self._lock:
+            self._remove(key)
+            self._pages[key] = body
+            self._tokens[key[0]].add(key)
+            self.bytes += len(body)
+
+            while len(self._pages) > self.entries or (self.bytes > self.max_bytes and len(self._pages) > 1):
+                self._remove(next(iter(self._pages)))
+                self.evictions += 1
+
+    def invalidate(self, token):
+        """
+        Removes all pages of cards list
+        """
+        with self._lock:
+            for key in list(self._tokens.get(token, [])):
+                self._remove(key)
+
+    def get_stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'pages': len(self._pages),
+                'bytes': self.bytes}
+
+    def _remove(self, key):
+        body = self._pages.pop(key, None)
+        if body is None:
+            return
+
+        self.bytes -= len(body)
+        keys = self._tokens[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._tokens[key[0]]
+
+
+page_cache = PageCache()
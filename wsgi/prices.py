@@ -0,0 +1,133 @@
+import warnings
+import numpy
+
+PRICE_PROPS = ['low', 'mid', 'high']
+
+
+class PriceMatrix(object):
+    """Packs redactions prices of cards list into array cards x redactions x (low, mid, high).
+    Missing redactions are stored as nan, so all medians and totals are calculated at once.
+    """
+
+    def __init__(self, cards, prices=None):
+        self.cards = cards
+        self.prices = prices if prices is not None else self._pack(cards)
+        self.numbers = numpy.array([card.number for card in cards], dtype=float)
+
+        with warnings.catch_warnings():
+            # cards without redactions have all prices missing and their medians are nan
+            warnings.simplefilter('ignore', RuntimeWarning)
+            self.medians = numpy.nanmedian(self.prices, axis=1)
+
+        self.totals = numpy.nansum(self.medians * self.numbers[:, numpy.newaxis], axis=0)
+
+    def _pack(self, cards):
+        """Builds prices array for cards
+
+        :param cards: list of models.Card
+        :return: numpy array with shape (cards, redactions, 3)
+        """
+        redas_num = max([len(card.redactions) for card in cards] + [1])
+        prices = numpy.empty((len(cards), redas_num, len(PRICE_PROPS)))
+        prices.fill(numpy.nan)
+
+        for i, card in enumerate(cards):
+            for j, reda in enumerate(card.redactions):
+                if reda.prices is not None:
+                    prices[i, j] = (reda.prices.low, reda.prices.mid, reda.prices.high)
+
+        return prices
+
+    def total(self, prop):
+        """Returns sum of median prices multiplied by cards number
+
+        :param prop: low, mid or high
+        :return: sum as float
+        """
+        return float(self.totals[PRICE_PROPS.index(prop)])
+
+    def get_totals(self):
+        """
+        Returns dict {low, mid, high} with sums of prices
+        """
+        return dict([(prop, self.total(prop)) for prop in PRICE_PROPS])
+
+    def get_order(self, prop, reverse=False):
+        """Returns indexes of cards ordered by median price, order of cards with equal price is kept
+
+        :param prop: low, mid or high
+        :param reverse: if True, cards are ordered from higher price to lower
+        :return: numpy array of indexes
+        """
+        values = self.medians[:, PRICE_PROPS.index(prop)]
+        return numpy.argsort(-values if reverse else values, kind='mergesort')
+
+    def take(self, indexes):
+        """Returns matrix for cards with specified indexes without repacking prices
+
+        :param indexes: list of cards indexes
+        :return: PriceMatrix object
+        """
+        return PriceMatrix([self.cards[i] for i in indexes], prices=self.prices[indexes])
+
+
+class PricedCards(list):
+    """
+    List of models.Card that builds its prices matrix once on the first access
+    """
+
+    def __init__(self, cards, prices=None):
+        super(PricedCards, self).__init__(cards)
+        self._prices = prices
+        self._redactions_index = None
+
+    @property
+    def prices(self):
+        if self._prices is None:
+            self._prices = PriceMatrix(self)
+        return self._prices
+
+    @property
+    def redactions_index(self):
+        if self._redactions_index is None:
+            self._redactions_index = build_redactions_index(self)
+        return self._redactions_index
+
+    def sort_by(self, sort, reverse=False):
+        """Returns cards ordered by name or low price, prices matrix is reused
+
+        :param sort: name or price
+        :param reverse: if True, order is descending
+        :return: PricedCards object
+        """
+        if sort == 'name':
+            indexes = sorted(range(len(self)), key=lambda i: self[i].name, reverse=reverse)
+        else:
+            indexes = self.prices.get_order('low', reverse=reverse)
+
+        matrix = self.prices.take(indexes)
+        return PricedCards(matrix.cards, prices=matrix)
+
+
+def get_matrix(cards):
+    """Returns prices matrix of cards list, builds it if list doesn't have one
+
+    :param cards: list of models.Card or PricedCards
+    :return: PriceMatrix object
+    """
+    return cards.prices if isinstance(cards, PricedCards) else PriceMatrix(cards)
+
+
+def build_redactions_index(cards):
+    """Maps tcg sids to redactions, redaction of the first card is kept if sid is repeated
+
+    :param cards: list of models.Card
+    :return: dict {sid: models.Redaction}
+    """
+    index = {}
+    for card in cards:
+        for reda in card.redactions:
+            if reda.prices is not None:
+                index.setdefault(reda.prices.sid, reda)
+
+    return index
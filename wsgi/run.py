@@ -1,12 +1,26 @@
-from flask import Flask, render_template, request, url_for, redirect
+from flask import Flask, render_template, request, url_for, redirect, abort
 import ext
+import decklist
 import scrapers
 import db
 import filters
+import metrics
+import optimizer
+import pagecache
+import schema
 import worker
 
+SELLERS_ON_PAGE = 50
+
 app = Flask(__name__)
 filters.register(app)
+metrics.register(app)
+metrics.registry.add_gauges('db_pool', db.get_pool_stats)
+metrics.registry.add_gauges('http_cache', scrapers.helpers.get_cache_stats)
+metrics.registry.add_gauges('http_connections', scrapers.helpers.get_connections_stats, label='host')
+metrics.registry.add_gauges('scraper_host', scrapers.helpers.get_scheduler_stats, label='host')
+metrics.registry.add_gauges('page_cache', pagecache.page_cache.get_stats)
+app.before_first_request(schema.bootstrap)
 
 
 @app.route("/", methods=['GET'])
@@ -20,12 +34,14 @@ def upload():
     f = request.files['cards_list']
     list_type = ext.result_or_default(lambda: request.form['list_type'], default='public', prevent_empty=True)
     if f:
-        content = ext.read_file(f.stream)
-        cards = scrapers.resolve_cards_async(content)
-        cards = ext.merge_pups(cards)
+        try:
+            content = list(decklist.DecklistReader(f.stream))
+        except decklist.DecklistError:
+            return render_template('upload.html', has_error=True)
+
+        cards = ext.merge_pups(scrapers.resolve_cards_async(content))
 
-        token = db.get_unique_token()
-        db.save_cards(token, list_type, cards)
+        token = db.save_new_cards(list_type, cards)
 
         if len(filter(lambda c: not c.is_resolved, cards)) > 0:
             return redirect(url_for('stats', token=token))
@@ -38,65 +54,121 @@ def upload():
 @app.route('/<token>/l', defaults={'repr': 'l'}, methods=['GET'])
 @app.route('/<token>/<repr>', methods=['GET'])
 def cards(token, repr):
-    cards = db.get_cards(token, only_resolved=True)
     sort = ext.result_or_default(lambda: request.args['sort'], default='name', prevent_empty=True)
     order = ext.result_or_default(lambda: request.args['order'], default='asc', prevent_empty=True)
+    if repr not in ['l', 't']:
+        return render_template('error.html')
 
-    key_for_sort = lambda c: c.name if sort == 'name' else c.get_avg_prices()['low']
-    templ_data = {'token': token, 'cards': sorted(cards, key=key_for_sort, reverse=order == 'desc'),
+    list_rev = db.get_list_rev(token)
+    if list_rev is None:
+        return render_cards(token, repr, sort, order)
+
+    return cached_page((token, repr, sort, order, list_rev), lambda: render_cards(token, repr, sort, order))
+
+
+def render_cards(token, repr, sort, order):
+    cards = db.get_cards(token, only_resolved=True)
+    templ_data = {'token': token, 'cards': cards.sort_by(sort, reverse=order == 'desc'),
                   'repr': repr, 'sort': sort, 'order': order}
 
     if repr == 'l':
         return render_template('cards_list.html', **templ_data)
-    elif repr == 't':
+    else:
         return render_template('cards_table.html', **templ_data)
+
+
+def cached_page(key, render):
+    """Returns rendered page from cache or renders it. Browser that has the same page gets 304 without body.
+
+    :param key: tuple (token, view, view arguments..., revisions of data shown on page)
+    :param render: function that renders page
+    :return: response
+    """
+    etag = pagecache.get_etag(key)
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
     else:
-        return render_template('error.html')
+        body = pagecache.page_cache.get(key)
+        if body is None:
+            body = render().encode('utf-8')
+            pagecache.page_cache.put(key, body)
+        response = app.response_class(body)
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 
 @app.route('/<token>/s', methods=['GET'])
 def stats(token):
-    cards = db.get_cards(token)
+    cards = db.get_cards(token, fields=db.CARD_STATS_FIELDS)
     return render_template('upload_stats.html', token=token, cards=cards)
 
 
 @app.route('/<token>/shop/tcg', methods=['GET'])
 def tcg(token):
-    cards = db.get_cards(token, only_resolved=True)
-    task = worker.get_task(token)
+    list_rev = db.get_list_rev(token)
+    task_rev = db.get_updated_task_rev(token)
+    if list_rev is not None and task_rev is not None:
+        return cached_page((token, 'tcg', list_rev, task_rev), lambda: render_tcg(token))
+
+    return render_tcg(token)
+
+
+def render_tcg(token):
+    cards = db.get_cards(token, only_resolved=True, fields=db.CARD_BRIEF_FIELDS)
+    task = worker.get_task(token, with_offers=False)
     if task.status == 'need update':
-        worker.run_daemon()
+        worker.enqueue(token)
         return render_template('cards_tcg_status.html', token=token, cards=cards, task=task)
 
+    # offers are loaded only for updated task, task could be deleted by update meanwhile
+    task = db.get_task(token) or task
+
     sellers = scrapers.get_tcg_sellers(task, cards)
-    sellers_av = filter(lambda s: s.has_all_cards(cards), sellers)
-    sellers_av = sorted(sellers_av, key=lambda s: s.cards_cost)
-    sellers_al = sorted(sellers, key=lambda s: s.available_cards_num, reverse=True)
+    cards_num = sum([c.number for c in cards])
+    sellers_av = sellers.top(SELLERS_ON_PAGE, key=lambda s: s.cards_cost,
+                             condition=lambda s: s.available_cards_num == cards_num)
+    sellers_al = sellers.top(SELLERS_ON_PAGE, key=lambda s: s.available_cards_num, reverse=True)
+    cart = optimizer.optimize_cart(task, cards)
 
     return render_template('cards_tcg_sellers.html', token=token, cards=cards,
-                           sellers_groups={'av': sellers_av, 'al': sellers_al})
+                           sellers_groups={'av': sellers_av, 'al': sellers_al}, cart=cart)
 
 
 @app.route('/<token>/shop/tcg/update', methods=['GET'])
 def tcg_update(token):
     db.delete_task(token)
+    pagecache.page_cache.invalidate(token)
     return redirect(url_for('tcg', token=token))
 
 
 @app.route('/<token>/shop/bm', methods=['GET'])
 def bm(token):
-    cards = db.get_cards(token, only_resolved=True)
-    offers = scrapers.get_buymagic_offers_async(cards)
-
-    return render_template('cards_bm_offers.html', token=token, cards=cards, offers=offers)
+    return render_shop_offers(token, 'buymagic', 'cards_bm_offers.html')
 
 
 @app.route('/<token>/shop/ss', methods=['GET'])
 def ss(token):
-    cards = db.get_cards(token, only_resolved=True)
-    offers = scrapers.get_spellshop_offers_async(cards)
+    return render_shop_offers(token, 'spellshop', 'cards_ss_offers.html')
 
-    return render_template('cards_ss_offers.html', token=token, cards=cards, offers=offers)
+
+def render_shop_offers(token, shop, template):
+    """Renders cached offers of shop, stale and missing ones are refreshed by worker.
+    Status page is shown until all cards have offers.
+
+    :param shop: name of shop from scrapers.SHOPS
+    :param template: template of offers page
+    """
+    cards = db.get_cards(token, only_resolved=True, fields=db.CARD_BRIEF_FIELDS)
+    offers, stale, missing = scrapers.get_cached_shop_offers(shop, cards)
+    if stale or missing:
+        worker.enqueue(token, shop)
+
+    if missing:
+        return render_template('cards_shop_status.html', token=token, cards=cards, shop=shop, missing=missing)
+
+    return render_template(template, token=token, cards=cards, offers=offers, stale=stale)
 
 
 @app.route('/privateclists', methods=['GET'])
@@ -110,10 +182,19 @@ def delete():
     if 'token' in request.form:
         token = request.form['token']
         db.delete_cards(token)
+        pagecache.page_cache.invalidate(token)
 
     return redirect(url_for('index'))
 
 
+@app.route('/metrics', methods=['GET'])
+def metrics_text():
+    if not metrics.METRICS_ENABLED:
+        abort(404)
+
+    return metrics.registry.render(), 200, {'Content-Type': metrics.CONTENT_TYPE}
+
+
 @app.route('/err')
 @app.errorhandler(403)
 @app.errorhandler(404)
@@ -0,0 +1,200 @@
+import sys
+import traceback
+from datetime import datetime, timedelta
+import pymongo
+from pymongo import errors
+import db
+
+ASC = pymongo.ASCENDING
+DESC = pymongo.DESCENDING
+
+# (collection, index keys, True if index is unique, filter of indexed documents or None)
+INDEXES = [
+    ('list', [('token', ASC)], True, None),
+    ('list', [('list_type', ASC), ('created_at', DESC)], False, None),
+    ('list', [('created_at', DESC)], False, None),
+    ('list', [('cards.redactions.prices.sid', ASC)], False, None),
+    ('list', [('summary_stale', ASC)], False, {'summary_stale': {'$exists': True}}),
+    ('tasks', [('token', ASC)], True, None),
+    ('tasks', [('status', ASC)], False, None),
+    ('resolved', [('key', ASC)], True, None),
+    ('shop_offers', [('shop', ASC), ('key', ASC)], True, None),
+    ('sid_prices', [('sid', ASC)], True, None),
+    ('sid_prices', [('fetched_at', ASC)], False, None),
+    ('jobs', [('status', ASC), ('created_at', ASC)], False, None),
+    ('jobs', [('status', ASC), ('lease_until', ASC)], False, None),
+    # active job of list is unique, finished ones are kept
+    ('jobs', [('token', ASC), ('kind', ASC)], True, {'active': {'$exists': True}}),
+    ('workers', [('worker', ASC)], True, None),
+    ('workers', [('heartbeat_at', ASC)], False, None),
+]
+
+# (name, function) of data migrations, each is applied once and its name is stored in migrations collection.
+# They could read all lists, so they are applied by "schema.py ensure" and prices refresher, not at startup
+MIGRATIONS = [
+    ('sid_catalog', db.sync_sid_catalog),
+]
+
+# query is slow if it reads more documents than this number of returned ones
+SLOW_EXAMINED_RATIO = 10
+
+
+def ensure_indexes():
+    """Creates missing indexes, existing ones are not changed.
+    Lists saved before creation time was stored get it from their id, so they are found by listing index.
+    Queued and running jobs saved before they were marked active are marked, so they are unique too.
+
+    :return: list of created indexes names
+    """
+    database = db.get_db()
+
+    for dict_list in database.list.find({'created_at': {'$exists': False}}, {'_id': 1}):
+        database.list.update({'_id': dict_list['_id']},
+                             {'$set': {'created_at': dict_list['_id'].generation_time.replace(tzinfo=None)}})
+    database.jobs.update({'status': {'$in': ['queued', 'leased']}, 'active': {'$exists': False}},
+                         {'$set': {'active': True}}, multi=True)
+
+    created = []
+    for collection, keys, unique, partial in get_missing_indexes():
+        options = {'partialFilterExpression': partial} if partial else {}
+        created.append(database[collection].create_index(keys, unique=unique, background=True, **options))
+
+    return created
+
+
+def apply_migrations():
+    """Applies data migrations which weren't applied yet
+
+    :return: list of applied migrations names
+    """
+    database = db.get_db()
+
+    done = set([dict_obj['name'] for dict_obj in database.migrations.find({}, {'name': 1})])
+    applied = []
+    for name, migrate in MIGRATIONS:
+        if name not in done:
+            migrate()
+            database.migrations.update({'name': name}, {'$set': {'applied_at': datetime.utcnow()}}, upsert=True)
+            applied.append(name)
+
+    return applied
+
+
+def bootstrap():
+    """
+    Ensures indexes at startup, errors are printed, so application runs even if db isn't ready
+    """
+    try:
+        ensure_indexes()
+    except errors.PyMongoError:
+        traceback.print_exc()
+
+
+def get_missing_indexes():
+    """Compares existing indexes with required ones
+
+    :return: list of tuples (collection, keys, unique, partial) from INDEXES which don't exist
+    """
+    database = db.get_db()
+
+    missing = []
+    existing = {}
+    for collection, keys, unique, partial in INDEXES:
+        if collection not in existing:
+            existing[collection] = [(list(info['key']), bool(info.get('unique')), info.get('partialFilterExpression'))
+                                    for info in database[collection].index_information().values()]
+
+        if (keys, unique, partial) not in existing[collection]:
+            missing.append((collection, keys, unique, partial))
+
+    return missing
+
+
+def get_queries():
+    """Queries made by application, their plans are checked
+
+    :return: list of tuples (description, collection, filter, sort)
+    """
+    now = datetime.utcnow()
+    return [
+        ('cards list by token', 'list', {'token': 'abcdef'}, None),
+        ('public lists', 'list', {'list_type': 'public'}, [('created_at', DESC)]),
+        ('all lists', 'list', {}, [('created_at', DESC)]),
+        ('task by token', 'tasks', {'token': 'abcdef'}, None),
+        ('resolved card', 'resolved', {'key': 'lightning bolt'}, None),
+        ('lists with sids', 'list', {'cards.redactions.prices.sid': {'$in': ['1', '2']}}, None),
+        ('stale summaries', 'list', {'summary_stale': True}, None),
+        ('sid prices', 'sid_prices', {'sid': {'$in': ['1', '2']}, 'url': {'$exists': True}}, None),
+        ('stale sids', 'sid_prices', {'fetched_at': {'$lt': now}}, [('fetched_at', ASC)]),
+        ('shop offers', 'shop_offers', {'shop': 'buymagic', 'key': {'$in': ['lightning bolt', 'opt']}}, None),
+        ('queued jobs', 'jobs', {'status': 'queued'}, [('created_at', ASC)]),
+        ('expired jobs', 'jobs', {'status': 'leased', 'lease_until': {'$lt': now}}, None),
+        ('job of token', 'jobs', {'token': 'abcdef', 'kind': 'tcg', 'active': True}, None),
+        ('alive workers', 'workers', {'heartbeat_at': {'$gte': now - timedelta(minutes=1)}}, None),
+    ]
+
+
+def get_plan_stages(plan):
+    """
+    Returns names of all stages of query plan from the top one
+    """
+    stages = [plan.get('stage')]
+    for child in [plan.get('inputStage')] + plan.get('inputStages', []):
+        if child:
+            stages.extend(get_plan_stages(child))
+
+    return stages
+
+
+def explain_query(collection, query_filter, sort=None, limit=5):
+    """Explains query and checks that it uses index
+
+    :return: dict {stages, examined, returned, millis, slow}
+    """
+    cursor = db.get_db()[collection].find(query_filter).limit(limit)
+    if sort:
+        cursor = cursor.sort(sort)
+
+    explain = cursor.explain()
+    stages = get_plan_stages(explain.get('queryPlanner', {}).get('winningPlan', {}))
+    stats = explain.get('executionStats', {})
+    examined = stats.get('totalDocsExamined', 0)
+    returned = stats.get('nReturned', 0)
+
+    return {'stages': stages,
+            'examined': examined,
+            'returned': returned,
+            'millis': stats.get('executionTimeMillis', 0),
+            'slow': 'COLLSCAN' in stages or 'SORT' in stages or examined > SLOW_EXAMINED_RATIO * max(returned, 1)}
+
+
+def check():
+    """Prints missing indexes and plans of application queries
+
+    :return: number of problems
+    """
+    problems = 0
+    for collection, keys, unique, partial in get_missing_indexes():
+        print 'missing index %s %s%s%s' % (collection, keys, ' unique' if unique else '',
+                                           ' for %s' % partial if partial else '')
+        problems += 1
+
+    for description, collection, query_filter, sort in get_queries():
+        result = explain_query(collection, query_filter, sort)
+        print '%-4s %-20s %-40s examined %d, returned %d, %d ms' % ('SLOW' if result['slow'] else 'ok',
+                                                                      description,
+                                                                      ' <- '.join(result['stages']),
+                                                                      result['examined'],
+                                                                      result['returned'],
+                                                                      result['millis'])
+        problems += 1 if result['slow'] else 0
+
+    return problems
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'check'
+    if command == 'ensure':
+        print 'created indexes: %s' % ', '.join(ensure_indexes())
+        print 'applied migrations: %s' % ', '.join(apply_migrations())
+    sys.exit(1 if check() else 0)
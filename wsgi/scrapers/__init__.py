@@ -1,21 +1,48 @@
-import eventlet
+import traceback
+import db
 import ext
+import models
 import worker
-from scrapers import magiccards, buymagic, spellshop
+from scrapers import magiccards, buymagic, spellshop, scheduler, parsing
 from scrapers.tcgplayer import TCGPlayerScrapper
 
 
 def resolve_cards_async(content):
-    """Parses card info using MagiccardScrapper in thread for request mode and
-    mergers duplicates
+    """Parses card info using MagiccardScrapper in green threads for request mode.
+    Each canonical name is resolved once, numbers of its duplicates are summed and set to resolved card.
 
-    :param content: list of (card_name, card_number) tuples
+    :param content: iterable of dict (card name, card number), e.g. list of records read by decklist.DecklistReader
     :return: list of models.Card objects
     """
-    pool = eventlet.GreenPool(len(content))
-    cards = [card for card in pool.imap(magiccards.resolve_card, _filter_lands(content))]
+    numbers = {}
+    resolved = list(scheduler.imap(_resolve_distinct, _merge_duplicates(_filter_lands(content), numbers)))
+    for key, card in resolved:
+        card.number = numbers[key]
 
-    return cards
+    return [card for _, card in resolved]
+
+
+def _merge_duplicates(content, numbers):
+    """Yields the first record of each canonical name with collapsed whitespaces,
+    numbers of all records are summed while they are read
+
+    :param content: iterable of dict (card name, card number)
+    :param numbers: dict {canonical name: total number} that is filled
+    :return: iterator of tuples (canonical name, record)
+    """
+    for record in content:
+        key = ext.normalize_name(record['name'])
+        if key in numbers:
+            numbers[key] += record['number']
+            continue
+
+        numbers[key] = record['number']
+        yield key, dict(record, name=' '.join(record['name'].split()))
+
+
+def _resolve_distinct(item):
+    key, record = item
+    return key, magiccards.resolve_card(record)
 
 
 def _filter_lands(content):
@@ -30,50 +57,81 @@ def _filter_lands(content):
 
 
 def get_tcg_sellers(task, cards):
-    """Reads task results and parses tcg sellers info
+    """Reads task results and aggregates tcg sellers info
 
     :param task: object of models.Task
     :param cards: list of models.Card objects
-    :return: list of models.TCGSeller objects with filled cards property
+    :return: models.TCGSellersRegistry object with sellers which cards property is filled
     """
-    sellers = []
+    registry = models.TCGSellersRegistry(cards)
     for entry in task.entries:
-        card = ext.get_first(cards, lambda c: c.name == entry.card_name)
-        for seller_offers in entry.offers:
-            seller = ext.get_first(sellers, lambda s: s == seller_offers['seller'])
-            if seller is None:
-                seller = seller_offers['seller']
-                sellers.append(seller)
+        registry.add_entry(entry)
 
-            for offer in seller_offers['offers']:
-                seller.add_card_offer(card, offer)
+    return registry
 
-    return sellers
 
+def get_cached_shop_offers(shop, cards):
+    """Reads cached offers of cards in shop
 
-def get_buymagic_offers_async(cards):
-    """Parses async www.buymagic.ua to obtain offers
-
+    :param shop: name of shop from SHOPS
     :param cards: list of models.Card objects
-    :return: dict {models.Card: models.ShopOffer}
+    :return: tuple (dict {models.Card: list of models.ShopOffer}, list of models.Card with stale offers,
+             list of models.Card without offers yet)
     """
-    offers = {}
-    pool = eventlet.GreenPool(len(cards))
-    for card, card_offers in pool.imap(buymagic.get_offers, cards):
-        offers[card] = card_offers
+    cached = db.get_shop_offers(shop, [card.name for card in cards])
+
+    offers, stale, missing = {}, [], []
+    for card in cards:
+        key = ext.normalize_name(card.name)
+        if key not in cached:
+            missing.append(card)
+            continue
 
-    return offers
+        dict_offers, is_fresh = cached[key]
+        offers[card] = [models.ShopOffer(card, **dict_offer) for dict_offer in dict_offers]
+        if not is_fresh:
+            stale.append(card)
 
+    return offers, stale, missing
 
-def get_spellshop_offers_async(cards):
-    """Parses async www.spellshop.com.ua to obtain offers
 
+def refresh_shop_offers(shop, cards):
+    """Parses async offers of cards which cached offers are stale or missing and saves them.
+    Offers of cards that couldn't be parsed aren't saved, so they are parsed again next time.
+
+    :param shop: name of shop from SHOPS
     :param cards: list of models.Card objects
-    :return: dict {models.Card: models.ShopOffer}
+    :return: number of refreshed cards
+    """
+    _, stale, missing = get_cached_shop_offers(shop, cards)
+
+    refreshed = 0
+    for card, offers in scheduler.imap(lambda card: _get_shop_offers(shop, card), stale + missing):
+        if offers is not None:
+            db.save_shop_offers(shop, card.name, offers)
+            refreshed += 1
+
+    return refreshed
+
+
+def _get_shop_offers(shop, card):
+    """
+    Returns tuple (models.Card, list of models.ShopOffer or None if page couldn't be loaded or parsed)
     """
-    offers = {}
-    pool = eventlet.GreenPool(10 if len(cards) > 10 else len(cards))
-    for card, offer in pool.imap(spellshop.get_offers, cards):
-        offers[card] = offer
+    try:
+        return SHOPS[shop](card)
+    except (parsing.ParseError, IOError):
+        traceback.print_exc()
+        return card, None
+
+
+def _get_spellshop_offers(card):
+    card, offer = spellshop.get_offers(card)
+    return card, [offer] if offer is not None else []
+
 
-    return offers
\ No newline at end of file
+# shop name: function that parses offers of card and returns tuple (models.Card, list of models.ShopOffer)
+SHOPS = {
+    'buymagic': buymagic.get_offers,
+    'spellshop': _get_spellshop_offers,
+}
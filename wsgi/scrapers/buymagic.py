@@ -1,13 +1,16 @@
 # coding=utf-8
-from bs4 import BeautifulSoup
 import models
 import ext
 import filters
+from scrapers import parsing
 from scrapers.helpers import openurl, quote
 
 BASE_SEARCH_URL = 'http://www.buymagic.com.ua/edition/?color=-1&type=-1&rare=-1&id=-1&' \
                   'name={card.name}&description=&card_type=&artist=' \
                   '&ms=0&mv=-1&ps=0&pv=-1&ts=0&tv=-1&s=1&submit=%D0%98%D1%81%D0%BA%D0%B0%D1%82%D1%8C'
+SEARCH_RESULT_PART = parsing.only(['div'], class_=r'\bc2\b')
+# labels of requests metric
+METRIC_LABELS = ('www.buymagic.com.ua', 'buymagic')
 
 
 def get_offers(card):
@@ -17,28 +20,45 @@ def get_offers(card):
     :return: returns tuple (models.Card, list of models.ShopOffer)
     """
     search_url = BASE_SEARCH_URL.replace('{card.name}', quote(card.name))
-    page = openurl(search_url)
-    page = fix_page(page)
-    soup = BeautifulSoup(page)
+    page = openurl(search_url, labels=METRIC_LABELS)
+    return card, parse_offers(card, page)
+
+
+def parse_offers(card, page):
+    """Parses offers of card from search page
+
+    :param card: models.Card object
+    :param page: buymagic search page
+    :return: list of models.ShopOffer, empty if card isn't found
+    :raise parsing.ParseError: if page doesn't have search results markup
+    """
+    soup = parsing.parse(fix_page(page), SEARCH_RESULT_PART)
+
+    root_div = soup.find('div', class_='c2')
+    if root_div is None:
+        raise parsing.ParseError('buymagic search results are not found')
+
+    found_p = root_div.find('p')
+    if found_p is None:
+        return []
 
     offers = []
     try:
-        root_div = soup.find('div', class_='c2')
-        card_div = root_div.find('p').contents[1].find('div')
+        card_div = found_p.contents[1].find('div')
 
         url = card_div.find('a')['href']
         price_table = card_div.find('table')
 
         for td_list in [offer_tr.find_all('td') for offer_tr in price_table.find_all('tr')]:
-            type = 'common' if ext.uni(td_list[0].find('b')) == 'Обычный'.decode('utf-8') else 'foil'
-            price = filters.price_str_to_float(ext.uni(ext.uah_to_dollar(td_list[1])))
+            type = 'common' if ext.uni(td_list[0].find('b').text) == ext.uni('Обычный') else 'foil'
+            price = filters.price_str_to_float(ext.uni(ext.uah_to_dollar(td_list[1].text)))
             number = len(td_list[2].find_all('option'))
 
             offers.append(models.ShopOffer(card, url, number, price, type=type))
-    except:
-        pass
+    except parsing.MARKUP_ERRORS as e:
+        raise parsing.ParseError('wrong buymagic offers of %s: %r' % (card.name, e))
 
-    return card, offers
+    return offers
 
 
 def fix_page(page):
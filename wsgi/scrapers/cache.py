@@ -0,0 +1,232 @@
+import collections
+import cPickle
+import hashlib
+import os
+import re
+import time
+import urlparse
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CACHE_DIR = os.path.join(os.environ.get('OPENSHIFT_DATA_DIR', os.path.join(BASE_DIR, 'data')), 'http_cache')
+CACHE_ENABLED = os.environ.get('HTTP_CACHE', 'on') != 'off'
+CACHE_MAX_BYTES = int(os.environ.get('HTTP_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))
+CACHE_MEMORY_ENTRIES = int(os.environ.get('HTTP_CACHE_MEMORY_ENTRIES', '200'))
+# part of max size that is left after eviction, so directory isn't read again on every write
+CACHE_EVICT_TO = float(os.environ.get('HTTP_CACHE_EVICT_TO', '0.9'))
+
+# (host regex, seconds while cached page is used without revalidation)
+TTL_RULES = [
+    (re.compile(r'(^|\.)magiccards\.info$'), 7 * 24 * 3600),
+    (re.compile(r'^partner\.tcgplayer\.com$'), 3600),
+    (re.compile(r'^store\.tcgplayer\.com$'), 600),
+    (re.compile(r'(^|\.)(buymagic\.com\.ua|spellshop\.com\.ua)$'), 1800),
+]
+
+
+def get_ttl(url):
+    """Returns ttl of cached page for url host
+
+    :param url: page url
+    :return: seconds or None if pages of host are not cached
+    """
+    host = urlparse.urlparse(url).hostname or ''
+    for host_re, ttl in TTL_RULES:
+        if host_re.search(host):
+            return ttl
+
+    return None
+
+
+class CacheEntry(object):
+    """
+    Cached page with validators
+    """
+
+    def __init__(self, url, body, etag=None, last_modified=None, ttl=0, stored_at=None):
+        self.url = url
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.ttl = ttl
+        self.stored_at = stored_at if stored_at is not None else time.time()
+
+    @property
+    def is_fresh(self):
+        return time.time() - self.stored_at < self.ttl
+
+
+class ResponseCache(object):
+    """Two tier pages cache: bounded in-memory LRU with recently used entries
+    and bounded on-disk LRU store with all entries.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, memory_entries=CACHE_MEMORY_ENTRIES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+
+        self._memory = collections.OrderedDict()
+        self._disk = None
+        self._disk_bytes = 0
+
+    def get(self, url):
+        """Returns cached entry for url, fresh or not
+
+        :param url: page url
+        :return: CacheEntry object or None
+        """
+        key = self._key(url)
+        entry = self._memory.pop(key, None)
+        if entry is None:
+            entry = self._read(key)
+            if entry is None:
+                return None
+
+        self._remember(key, entry)
+        self._touch_disk(key)
+        return entry
+
+    def put(self, url, body, etag=None, last_modified=None, ttl=0):
+        """Stores page in both tiers
+
+        :return: CacheEntry object
+        """
+        entry = CacheEntry(url, body, etag=etag, last_modified=last_modified, ttl=ttl)
+        key = self._key(url)
+        self._remember(key, entry)
+        self._write(key, entry)
+        return entry
+
+    def refresh(self, entry):
+        """
+        Marks entry as fresh after server confirmed that page wasn't modified
+        """
+        entry.stored_at = time.time()
+        self._write(self._key(entry.url), entry)
+
+    def record_hit(self, entry):
+        self.hits += 1
+        self.bytes_saved += len(entry.body)
+
+    def record_revalidation(self, entry):
+        self.revalidated += 1
+        self.bytes_saved += len(entry.body)
+
+    def record_miss(self):
+        self.misses += 1
+
+    def get_stats(self):
+        """
+        Returns dict with cache counters
+        """
+        self._load_disk_index()
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'revalidated': self.revalidated,
+                'bytes_saved': self.bytes_saved,
+                'evictions': self.evictions,
+                'memory_entries': len(self._memory),
+                'disk_entries': len(self._disk),
+                'disk_bytes': self._disk_bytes}
+
+    def _key(self, url):
+        return hashlib.sha1(url.encode('utf-8') if isinstance(url, unicode) else url).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _load_disk_index(self, reload=False):
+        """Reads sizes of stored entries ordered from least to most recently used
+
+        :param reload: if True, index is read again with entries written by other processes
+        """
+        if self._disk is not None and not reload:
+            return
+
+        self._disk = collections.OrderedDict()
+        self._disk_bytes = 0
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.tmp'):
+                continue
+            try:
+                stat = os.stat(self._path(name))
+            except OSError:
+                # entry is removed by other process
+                continue
+            files.append((stat.st_mtime, name, stat.st_size))
+
+        for _, name, size in sorted(files):
+            self._disk[name] = size
+            self._disk_bytes += size
+
+    def _touch_disk(self, key):
+        """
+        Moves entry to the end of LRU order, modification time keeps the order between restarts
+        """
+        if self._disk is not None and key in self._disk:
+            self._disk[key] = self._disk.pop(key)
+            try:
+                os.utime(self._path(key), None)
+            except OSError:
+                pass
+
+    def _read(self, key):
+        self._load_disk_index()
+        if key not in self._disk:
+            return None
+
+        try:
+            with open(self._path(key), 'rb') as f:
+                return cPickle.load(f)
+        except (IOError, EOFError, cPickle.UnpicklingError):
+            self._forget(key)
+            return None
+
+    def _write(self, key, entry):
+        self._load_disk_index()
+        data = cPickle.dumps(entry, cPickle.HIGHEST_PROTOCOL)
+
+        tmp_path = '%s.%d.tmp' % (self._path(key), os.getpid())
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.rename(tmp_path, self._path(key))
+
+        self._disk_bytes -= self._disk.pop(key, 0)
+        self._disk[key] = len(data)
+        self._disk_bytes += len(data)
+
+        if self._disk_bytes <= self.max_bytes:
+            return
+
+        # processes share directory, so index is read again to evict entries of all of them
+        self._load_disk_index(reload=True)
+        while self._disk_bytes > self.max_bytes * CACHE_EVICT_TO and len(self._disk) > 1:
+            oldest_key = next(iter(self._disk))
+            self._forget(oldest_key)
+            self._memory.pop(oldest_key, None)
+            self.evictions += 1
+
+    def _forget(self, key):
+        self._disk_bytes -= self._disk.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,178 @@
+import os
+import socket
+import time
+import urlparse
+from eventlet import semaphore
+from eventlet.green import httplib
+import ext
+
+POOL_MAX_SIZE = int(os.environ.get('HTTP_POOL_MAX_SIZE', '8'))
+POOL_IDLE_TIMEOUT = float(os.environ.get('HTTP_POOL_IDLE_TIMEOUT', '30'))
+HTTP_TIMEOUT = float(os.environ.get('HTTP_TIMEOUT', '30'))
+MAX_REDIRECTS = 5
+REDIRECT_CODES = (301, 302, 303, 307)
+
+
+class Response(object):
+    """
+    Downloaded page with status and headers
+    """
+
+    def __init__(self, url, status, reason, headers, body):
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+
+
+class HostPool(object):
+    """Keeps alive connections to one host.
+    Number of connections used at the same time is limited, green threads wait for free one.
+    """
+
+    def __init__(self, scheme, host, port, max_size=POOL_MAX_SIZE, idle_timeout=POOL_IDLE_TIMEOUT):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+
+        self.created = 0
+        self.reused = 0
+
+        self._idle = []
+        self._semaphore = semaphore.Semaphore(max_size)
+
+    @property
+    def idle_num(self):
+        return len(self._idle)
+
+    def acquire(self):
+        """Waits for free slot and returns connection, idle one if there is such
+
+        :return: tuple (connection, True if connection was used before)
+        """
+        self._semaphore.acquire()
+        self.evict_idle()
+        if self._idle:
+            conn, _ = self._idle.pop()
+            self.reused += 1
+            return conn, True
+
+        conn_class = httplib.HTTPSConnection if self.scheme == 'https' else httplib.HTTPConnection
+        self.created += 1
+        return conn_class(self.host, self.port, timeout=HTTP_TIMEOUT), False
+
+    def release(self, conn, reusable=True):
+        """Returns connection to pool or closes it
+
+        :param conn: connection from acquire
+        :param reusable: False if connection is broken or server is going to close it
+        """
+        if reusable:
+            self._idle.append((conn, time.time()))
+        else:
+            conn.close()
+        self._semaphore.release()
+
+    def evict_idle(self):
+        """
+        Closes connections that weren't used longer than idle timeout
+        """
+        expire_at = time.time() - self.idle_timeout
+        while self._idle and self._idle[0][1] < expire_at:
+            conn, _ = self._idle.pop(0)
+            conn.close()
+
+
+class ConnectionPool(object):
+    """Pools of keep-alive connections per host.
+    Pools are kept per OS thread, because their semaphores and green sockets belong to hub of thread.
+    """
+
+    def __init__(self, max_size=POOL_MAX_SIZE, idle_timeout=POOL_IDLE_TIMEOUT):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._hosts = ext.ThreadDicts()
+
+    def request(self, url, headers):
+        """Downloads url following redirects
+
+        :param url: ascii url
+        :param headers: dict of request headers
+        :return: Response object
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            response = self._get(url, headers)
+            location = response.headers.get('Location')
+            if response.status not in REDIRECT_CODES or not location:
+                return response
+
+            url = urlparse.urljoin(url, location)
+
+        return response
+
+    def get_stats(self):
+        """
+        Returns dict {host: {created, reused, idle}} summed over threads
+        """
+        stats = {}
+        for hosts in self._hosts.get_all():
+            for key, pool in hosts.items():
+                host_stats = stats.setdefault('%s://%s:%s' % key, {'created': 0, 'reused': 0, 'idle': 0})
+                host_stats['created'] += pool.created
+                host_stats['reused'] += pool.reused
+                host_stats['idle'] += pool.idle_num
+
+        return stats
+
+    def close(self):
+        """
+        Closes idle connections of all hosts of current thread
+        """
+        for pool in self._hosts.get().values():
+            while pool.idle_num:
+                conn, _ = pool._idle.pop()
+                conn.close()
+
+    def _get_host_pool(self, scheme, host, port):
+        hosts = self._hosts.get()
+        key = (scheme, host, port or (443 if scheme == 'https' else 80))
+        pool = hosts.get(key)
+        if pool is None:
+            pool = HostPool(*key, max_size=self.max_size, idle_timeout=self.idle_timeout)
+            hosts[key] = pool
+
+        return pool
+
+    def _get(self, url, headers):
+        """Makes one GET request, request on reused connection is retried once
+        on new one because server could close it while it was idle
+
+        :return: Response object
+        """
+        parts = urlparse.urlsplit(url)
+        pool = self._get_host_pool(parts.scheme, parts.hostname, parts.port)
+        path = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+
+        while True:
+            conn, reused = pool.acquire()
+            try:
+                conn.request('GET', path, headers=headers)
+                http_response = conn.getresponse()
+                body = http_response.read()
+            except (httplib.HTTPException, socket.error):
+                pool.release(conn, reusable=False)
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                # slot of pool is freed even when request is interrupted by timeout or kill of green thread
+                pool.release(conn, reusable=False)
+                raise
+
+            pool.release(conn, reusable=not http_response.will_close)
+            return Response(url, http_response.status, http_response.reason, http_response.msg, body)
+
+
+connection_pool = ConnectionPool()
@@ -1,10 +1,36 @@
 import gzip
+import time
 from StringIO import StringIO
 from eventlet.green import urllib2
 import ext
+import metrics
+from scrapers import cache, connections, scheduler
 
 
-def openurl(url, additional_headers=None):
+def openurl(url, additional_headers=None, use_cache=True, labels=('unknown', 'unknown')):
+    """Downloads page, pages of hosts with cache ttl rule are cached and revalidated.
+    Call is timed by labels of scraper that calls it.
+
+    :param url: page url
+    :param additional_headers: dict of headers added to default
+    :param use_cache: if False, page is always downloaded and isn't stored
+    :param labels: tuple (host, scraper) of request metric
+    :return: page content
+    """
+    if not metrics.METRICS_ENABLED:
+        return _openurl(url, additional_headers, use_cache)
+
+    start = time.time()
+    result = 'error'
+    try:
+        page = _openurl(url, additional_headers, use_cache)
+        result = 'ok'
+        return page
+    finally:
+        metrics.registry.observe('scraper_request_seconds', labels + (result,), time.time() - start)
+
+
+def _openurl(url, additional_headers, use_cache):
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/27.0.1453.110 Safari/537.36',
         'Accept-Language': 'ru-RU,ru;q=0.8,en-US;q=0.6,en;q=0.4',
@@ -16,18 +42,61 @@ def openurl(url, additional_headers=None):
     if additional_headers:
         headers.update(additional_headers)
 
-    opener = urllib2.build_opener()
-    opener.addheaders = headers.items()
-    response = opener.open(ext.iriToUri(url))
+    ttl = cache.get_ttl(url) if use_cache and cache.CACHE_ENABLED else None
+    entry = cache.response_cache.get(url) if ttl else None
+    if entry is not None:
+        if entry.is_fresh:
+            cache.response_cache.record_hit(entry)
+            return entry.body
+
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
 
-    if response.info().get('Content-Encoding') == 'gzip':
-        buf = StringIO(response.read())
-        response = gzip.GzipFile(fileobj=buf)
+    uri = ext.iriToUri(url)
+    response = scheduler.scheduler.fetch(uri, connections.connection_pool.request, uri, headers)
+    if response.status == 304 and entry is not None:
+        cache.response_cache.refresh(entry)
+        cache.response_cache.record_revalidation(entry)
+        return entry.body
+
+    if response.status >= 400:
+        raise urllib2.HTTPError(response.url, response.status, response.reason, response.headers, None)
+
+    page = response.body
+    if response.headers.get('Content-Encoding') == 'gzip':
+        page = gzip.GzipFile(fileobj=StringIO(page)).read()
+
+    if ttl:
+        cache.response_cache.record_miss()
+        cache.response_cache.put(url, page, etag=response.headers.get('ETag'),
+                                 last_modified=response.headers.get('Last-Modified'), ttl=ttl)
 
-    page = response.read()
     return page
 
 
+def get_cache_stats():
+    """
+    Returns counters of pages cache
+    """
+    return cache.response_cache.get_stats()
+
+
+def get_connections_stats():
+    """
+    Returns counters of keep-alive connections per host
+    """
+    return connections.connection_pool.get_stats()
+
+
+def get_scheduler_stats():
+    """
+    Returns concurrency limits, queue depth and wait time per host
+    """
+    return scheduler.scheduler.get_stats()
+
+
 def quote(card_name):
     """
     Quotes card name
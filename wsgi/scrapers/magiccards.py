@@ -1,12 +1,18 @@
 import difflib
-from bs4 import BeautifulSoup, Tag
+from bs4 import Tag
+import db
 import ext
 import models
+from scrapers import parsing
 from scrapers.helpers import openurl, quote
 from scrapers.tcgplayer import TCGPlayerScrapper
 
 MAGICCARDS_BASE_URL = 'http://magiccards.info/'
 MAGICCARDS_QUERY_TMPL = 'query?q=!%s&v=card&s=cname'
+# card info is in layout tables, hints are in list items
+MAGICCARDS_PART = parsing.only(['table', 'li'])
+# labels of requests metric
+METRIC_LABELS = ('magiccards.info', 'magiccards')
 
 
 def resolve_card(content_record):
@@ -15,6 +21,15 @@ def resolve_card(content_record):
     :param content_record: dict {card name, card number}
     :return: object models.Card
     """
+    cached = db.get_resolved_card(content_record['name'])
+    if cached is not None:
+        name, redactions, prices_are_fresh = cached
+        if not prices_are_fresh:
+            refresh_prices(redactions)
+            db.save_resolved_prices(content_record['name'], name, redactions)
+
+        return models.Card(name, content_record['number'], redactions=redactions)
+
     base_resolver = BasicResolver(content_record['name'])
     resolve_result = base_resolver.get_name_and_url()
     if resolve_result is None:
@@ -24,10 +39,31 @@ def resolve_card(content_record):
 
     advanced_resolver = AdvancedResolver(url)
     redactions = advanced_resolver.get_redactions()
-    if redactions is None:
+    if not redactions:
         return models.Card(name, content_record['number'])
 
-    return models.Card(name, content_record['number'], redactions=redactions)
+    card = models.Card(name, content_record['number'], redactions=redactions)
+    db.save_resolved_card(content_record['name'], card)
+
+    return card
+
+
+def refresh_prices(redactions):
+    """Updates tcg prices of redactions, fresh prices are taken from sids catalog.
+    Keeps old prices if tcg doesn't know redaction anymore.
+
+    :param redactions: list of models.Redaction
+    """
+    catalog = db.get_sid_prices([reda.prices.sid for reda in redactions])
+    for reda in redactions:
+        dict_prices, is_fresh = catalog.get(reda.prices.sid, (None, False))
+        if is_fresh:
+            reda.prices = models.CardPrices(**dict_prices)
+            continue
+
+        brief_prices_info = TCGPlayerScrapper(reda.prices.sid).get_brief_info()
+        if brief_prices_info is not None:
+            reda.prices = models.CardPrices(**brief_prices_info)
 
 
 class BasicResolver(object):
@@ -65,8 +101,7 @@ class BasicResolver(object):
         :param url: card url
         :return: tuple (card name, card url)
         """
-        page = openurl(url)
-        soup = BeautifulSoup(page)
+        soup = parsing.parse(openurl(url, labels=METRIC_LABELS), MAGICCARDS_PART)
 
         if len(soup.find_all('table')) > 2:
             return name, url
@@ -87,8 +122,7 @@ class BasicResolver(object):
         :param url: card url
         :return: tuple (card name, card url)
         """
-        page = openurl(url)
-        soup = BeautifulSoup(page)
+        soup = parsing.parse(openurl(url, labels=METRIC_LABELS), MAGICCARDS_PART)
         en_link_tag = list(soup.find_all('table')[3].find_all('td')[2].find('img', alt='English').next_elements)[1]
         if en_link_tag.name == 'b':
             return name, url
@@ -103,7 +137,7 @@ class BasicResolver(object):
         Selects hint that has max affinity with base card name.
 
         :param name: cards name
-        :param soup: soup page from www.magiccards.info
+        :param soup: parsed page from www.magiccards.info
         :return: tag 'a' with hint
         """
         hints_list = []
@@ -131,8 +165,7 @@ class AdvancedResolver(object):
 
         redas = []
         for name, url in reda_pages:
-            page = openurl(url)
-            reda_soup = BeautifulSoup(page)
+            reda_soup = parsing.parse(openurl(url, labels=METRIC_LABELS), MAGICCARDS_PART)
 
             info = self._get_card_info(reda_soup)
             price = self._get_prices(reda_soup)
@@ -152,9 +185,16 @@ class AdvancedResolver(object):
         :param page_url: card page url
         :return: list of dict (reda name, reda url)
         """
-        page = openurl(page_url)
-        soup = BeautifulSoup(page)
+        soup = parsing.parse(openurl(page_url, labels=METRIC_LABELS), MAGICCARDS_PART)
+        return self._parse_redas_urls(soup, page_url)
+
+    def _parse_redas_urls(self, soup, page_url):
+        """Parses card page and finds all available card redactions
 
+        :param soup: parsed card page
+        :param page_url: card page url
+        :return: list of dict (reda name, reda url)
+        """
         content_table = soup.find_all('table')[3]
         redas_td = content_table.find_all('td')[2]
 
@@ -182,7 +222,7 @@ class AdvancedResolver(object):
     def _get_card_info(self, soup):
         """Parses soup page and returns dict with card info
 
-        :param soup: soup page from www.magiccards.info
+        :param soup: parsed page from www.magiccards.info
         :return: dictionary with card info
         """
         content_table = soup.find_all('table')[3]
@@ -219,7 +259,7 @@ class AdvancedResolver(object):
     def _get_prices(self, magic_soup):
         """Parses prices by TCGPlayer card sid
 
-        :param magic_soup: soup page from www.magiccards.info
+        :param magic_soup: parsed page from www.magiccards.info
         :return: dictionary with prices from TCGPlayer in format {sid, low, mid, high}
         """
         content_table = magic_soup.find_all('table')[3]
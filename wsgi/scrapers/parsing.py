@@ -0,0 +1,139 @@
+import collections
+import os
+import re
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml
+    DEFAULT_PARSER = 'lxml'
+except ImportError:
+    DEFAULT_PARSER = 'html.parser'
+
+PARSER = os.environ.get('HTML_PARSER', DEFAULT_PARSER)
+PARTIAL_PARSING = os.environ.get('HTML_PARTIAL_PARSING', 'on') != 'off'
+PARSED_PAGES_NUM = int(os.environ.get('HTML_PARSED_PAGES_NUM', '8'))
+
+# errors of markup navigation when page doesn't have expected tags
+MARKUP_ERRORS = (AttributeError, IndexError, KeyError, TypeError, ValueError)
+
+
+class ParseError(ValueError):
+    """
+    Page doesn't have expected markup, e.g. layout of site is changed or error page is returned
+    """
+    pass
+
+
+def only(names, class_=None):
+    """Describes part of page that is enough for scraper.
+    Only top level tags with one of names and class matching regex are kept with all their children.
+    Plain function is used for matching because it is called for every tag of page.
+
+    :param names: list of tag names
+    :param class_: regex for class attribute as it is written in page or None
+    :return: bs4.SoupStrainer object
+    """
+    names = frozenset(names)
+    class_re = re.compile(class_) if class_ else None
+
+    def match(name, attrs):
+        if name not in names:
+            return False
+        if class_re is None:
+            return True
+
+        class_value = attrs.get('class') or ''
+        if not isinstance(class_value, basestring):
+            class_value = ' '.join(class_value)
+        return class_re.search(class_value) is not None
+
+    return SoupStrainer(match)
+
+
+class ParsedPage(object):
+    """
+    Parsed page that remembers results of searches from its root
+    """
+
+    def __init__(self, soup):
+        self.soup = soup
+        self._found = {}
+
+    def find_all(self, name=None, **attrs):
+        """Searches all tags from page root, result is shared between calls and shouldn't be changed
+
+        :return: list of bs4.Tag
+        """
+        key = ('find_all', name, tuple(sorted(attrs.items())))
+        if key not in self._found:
+            self._found[key] = self.soup.find_all(name, **attrs)
+        return self._found[key]
+
+    def find(self, name=None, **attrs):
+        """Searches first tag from page root
+
+        :return: bs4.Tag or None
+        """
+        key = ('find', name, tuple(sorted(attrs.items())))
+        if key not in self._found:
+            self._found[key] = self.soup.find(name, **attrs)
+        return self._found[key]
+
+
+class ParsedPages(object):
+    """
+    Bounded LRU of parsed pages, the same page parsed for the same part is built once
+    """
+
+    def __init__(self, size=PARSED_PAGES_NUM):
+        self.size = size
+        self.parsed = 0
+        self.reused = 0
+        self._pages = collections.OrderedDict()
+
+    def parse(self, page, part=None, remember=True):
+        """Parses page with configured parser
+
+        :param page: html string
+        :param part: SoupStrainer from only, if None whole page is parsed
+        :param remember: False for pages that are parsed only once, they don't push out other pages
+        :return: ParsedPage object
+        """
+        part = part if PARTIAL_PARSING else None
+        key = (part, page)
+        parsed_page = self._pages.pop(key, None)
+        if parsed_page is None:
+            parsed_page = ParsedPage(BeautifulSoup(page, PARSER, parse_only=part))
+            self.parsed += 1
+        else:
+            self.reused += 1
+
+        if not remember:
+            return parsed_page
+
+        self._pages[key] = parsed_page
+        while len(self._pages) > self.size:
+            self._pages.popitem(last=False)
+
+        return parsed_page
+
+    def get_stats(self):
+        return {'parser': PARSER,
+                'partial': PARTIAL_PARSING,
+                'parsed': self.parsed,
+                'reused': self.reused,
+                'pages': len(self._pages)}
+
+
+parsed_pages = ParsedPages()
+
+
+def parse(page, part=None, remember=True):
+    """Parses page or returns the same page parsed before
+
+    :param page: html string
+    :param part: SoupStrainer from only, if None whole page is parsed
+    :param remember: False for pages that are parsed only once
+    :return: ParsedPage object
+    """
+    return parsed_pages.parse(page, part, remember)
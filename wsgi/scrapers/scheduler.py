@@ -0,0 +1,232 @@
+import collections
+import os
+import time
+import urlparse
+import eventlet
+from eventlet import event
+import ext
+
+POOL_SIZE = int(os.environ.get('SCRAPER_POOL_SIZE', '20'))
+HOST_CONCURRENCY = float(os.environ.get('SCRAPER_HOST_CONCURRENCY', '4'))
+HOST_MAX_CONCURRENCY = float(os.environ.get('SCRAPER_HOST_MAX_CONCURRENCY', '8'))
+HOST_RATE = float(os.environ.get('SCRAPER_HOST_RATE', '10'))
+HOST_BURST = float(os.environ.get('SCRAPER_HOST_BURST', '10'))
+LATENCY_TARGET = float(os.environ.get('SCRAPER_LATENCY_TARGET', '3'))
+
+
+class TokenBucket(object):
+    """
+    Limits requests rate, allows short bursts
+    """
+
+    def __init__(self, rate=HOST_RATE, burst=HOST_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated_at = time.time()
+
+    def reserve(self):
+        """Takes one token, token could be borrowed from future
+
+        :return: seconds to wait before token can be used
+        """
+        now = time.time()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+        self._tokens -= 1
+
+        return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+
+class HostLimiter(object):
+    """Limits concurrent requests to one host.
+    Limit grows by one request per limit of successful ones (additive increase)
+    and halves on error or slow response (multiplicative decrease), at most once per latency target.
+    """
+
+    def __init__(self, concurrency=HOST_CONCURRENCY, max_concurrency=HOST_MAX_CONCURRENCY,
+                 rate=HOST_RATE, burst=HOST_BURST, latency_target=LATENCY_TARGET):
+        self.limit = concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_target = latency_target
+        self.active = 0
+
+        self.requests = 0
+        self.errors = 0
+        self.waited = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.latency = 0.0
+
+        self._bucket = TokenBucket(rate, burst)
+        self._waiters = collections.deque()
+        self._decreased_at = 0.0
+
+    @property
+    def queue_depth(self):
+        return len(self._waiters)
+
+    def acquire(self):
+        """
+        Waits for free request slot and rate limit token
+        """
+        start = time.time()
+        if self.active < int(self.limit) and not self._waiters:
+            self.active += 1
+        else:
+            waiter = event.Event()
+            self._waiters.append(waiter)
+            try:
+                waiter.wait()
+            except BaseException:
+                # slot is taken by release only for sent waiter, waiter that wasn't sent just leaves queue
+                if waiter.ready():
+                    self._free_slot()
+                else:
+                    self._waiters.remove(waiter)
+                raise
+
+        delay = self._bucket.reserve()
+        if delay:
+            try:
+                eventlet.sleep(delay)
+            except BaseException:
+                self._free_slot()
+                raise
+
+        wait_time = time.time() - start
+        if wait_time > 0.001:
+            self.waited += 1
+        self.wait_time += wait_time
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+
+    def release(self, latency, failed=False):
+        """Frees request slot and adapts limit
+
+        :param latency: seconds request took
+        :param failed: True if request failed or host answered with error
+        """
+        self.active -= 1
+        self.requests += 1
+        self.latency += latency
+
+        now = time.time()
+        if failed or latency > self.latency_target:
+            self.errors += 1 if failed else 0
+            if now - self._decreased_at > self.latency_target:
+                self.limit = max(1.0, self.limit / 2)
+                self._decreased_at = now
+        else:
+            self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+
+        self._wake_waiters()
+
+    def _free_slot(self):
+        """
+        Frees slot of request that was interrupted before it was made
+        """
+        self.active -= 1
+        self._wake_waiters()
+
+    def _wake_waiters(self):
+        while self._waiters and self.active < int(self.limit):
+            self.active += 1
+            self._waiters.popleft().send()
+
+    def get_stats(self):
+        return {'limit': self.limit,
+                'active': self.active,
+                'queue_depth': self.queue_depth,
+                'requests': self.requests,
+                'errors': self.errors,
+                'waited': self.waited,
+                'wait_time': self.wait_time,
+                'max_wait_time': self.max_wait_time,
+                'avg_latency': self.latency / self.requests if self.requests else 0.0}
+
+
+class Scheduler(object):
+    """Keeps request limits of hosts for all scrapers of the process.
+    Limiters are kept per OS thread, because their waiters belong to hub of thread,
+    so limits are applied to green threads of each OS thread separately.
+    """
+
+    def __init__(self):
+        self._limits = {}
+        self._hosts = ext.ThreadDicts()
+
+    def configure(self, host, **limits):
+        """Sets limits of host instead of defaults, limiters of all threads are created again on their next use
+
+        :param host: host name
+        :param limits: keyword arguments of HostLimiter
+        """
+        self._limits[host] = limits
+        for hosts in self._hosts.get_all():
+            hosts.pop(host, None)
+
+    def get_limiter(self, url):
+        """
+        Returns limiter of url host for current thread
+        """
+        hosts = self._hosts.get()
+        host = urlparse.urlparse(url).hostname
+        limiter = hosts.get(host)
+        if limiter is None:
+            limiter = HostLimiter(**self._limits.get(host, {}))
+            hosts[host] = limiter
+
+        return limiter
+
+    def fetch(self, url, func, *args):
+        """Calls func when host of url has free slot
+
+        :param url: url of requested page
+        :param func: function that makes request and returns object with status attribute
+        :return: result of func
+        """
+        limiter = self.get_limiter(url)
+        limiter.acquire()
+
+        start = time.time()
+        failed = True
+        try:
+            result = func(*args)
+            failed = result.status >= 500 or result.status == 429
+            return result
+        finally:
+            limiter.release(time.time() - start, failed=failed)
+
+    def get_stats(self):
+        """
+        Returns dict {host: limiter stats} of all threads, their counters are summed
+        """
+        stats = {}
+        latencies = {}
+        for hosts in self._hosts.get_all():
+            for host, limiter in hosts.items():
+                limiter_stats = limiter.get_stats()
+                latencies[host] = latencies.get(host, 0.0) + limiter.latency
+                host_stats = stats.get(host)
+                if host_stats is None:
+                    stats[host] = limiter_stats
+                    continue
+
+                for name, value in limiter_stats.items():
+                    host_stats[name] = max(host_stats[name], value) if name == 'max_wait_time' else \
+                        host_stats[name] + value
+
+        for host, host_stats in stats.items():
+            host_stats['avg_latency'] = latencies[host] / host_stats['requests'] if host_stats['requests'] else 0.0
+
+        return stats
+
+
+scheduler = Scheduler()
+
+
+def imap(func, iterable):
+    """
+    Runs func over iterable in green threads, hosts limits are applied by openurl
+    """
+    return eventlet.GreenPool(POOL_SIZE).imap(func, iterable)
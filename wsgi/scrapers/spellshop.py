@@ -1,10 +1,13 @@
-from bs4 import BeautifulSoup
 import ext
 import models
 import filters
+from scrapers import parsing
 from scrapers.helpers import openurl, quote
 
 BASE_SEARCH_URL = 'http://spellshop.com.ua/index.php?searchstring={card.name}'
+SEARCH_RESULT_PART = parsing.only(['td'], class_=r'\btd_center\b')
+# labels of requests metric
+METRIC_LABELS = ('spellshop.com.ua', 'spellshop')
 
 
 def get_offers(card):
@@ -15,12 +18,28 @@ def get_offers(card):
     """
     encoded_card_name = quote(card.name.replace('\'', ''))
     search_url = BASE_SEARCH_URL.replace('{card.name}', encoded_card_name)
-    page = openurl(search_url)
-    soup = BeautifulSoup(page)
+    page = openurl(search_url, labels=METRIC_LABELS)
+    return card, parse_offer(card, search_url, page)
+
+
+def parse_offer(card, search_url, page):
+    """Parses the first found offer from search page
+
+    :param card: models.Card object
+    :param search_url: url of search page
+    :param page: spellshop search page
+    :return: models.ShopOffer or None if card isn't found
+    :raise parsing.ParseError: if page doesn't have search results markup
+    """
+    soup = parsing.parse(page, SEARCH_RESULT_PART)
+
+    center_td = soup.find('td', class_='td_center')
+    if center_td is None:
+        raise parsing.ParseError('spellshop search results are not found')
 
     offer = None
     try:
-        cards_table = soup.find('td', class_='td_center').find('table')
+        cards_table = center_td.find('table')
         if cards_table is not None:
             card_tr = cards_table.find('tr')
             card_tds = card_tr.find_all('td')
@@ -30,7 +49,7 @@ def get_offers(card):
             number = len(card_tds[5].find_all('option'))
 
             offer = models.ShopOffer(card, url, number, price)
-    except:
-        pass
+    except parsing.MARKUP_ERRORS as e:
+        raise parsing.ParseError('wrong spellshop offer of %s: %r' % (card.name, e))
 
-    return card, offer
\ No newline at end of file
+    return offer
\ No newline at end of file
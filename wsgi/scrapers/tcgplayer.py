@@ -1,16 +1,24 @@
 import itertools
+import os
 import re
-from bs4 import BeautifulSoup
+import eventlet
 import ext
 import models
 import filters
+from scrapers import parsing
 from scrapers.helpers import openurl
 
 BRIEF_BASE_URL = 'http://partner.tcgplayer.com/x3/mchl.ashx?pk=MAGCINFO&sid='
 FULL_BASE_URL = 'http://store.tcgplayer.com/productcatalog/product/getpricetable' \
                 '?captureFeaturedSellerData=True&pageSize=50&productId='
+PAGES_POOL_SIZE = int(os.environ.get('TCG_PAGES_POOL_SIZE', '4'))
+BRIEF_PART = parsing.only(['td'], class_=r'^TCGPHiLo')
+PRICE_TABLE_PART = parsing.only(['tr', 'div'], class_=r'\b(vendor|pricePager)\b')
 FULL_URL_COOKIE = {'Cookie': 'SearchCriteria=WantGoldStar=False&MinRating=0&MinSales='
                              '&magic_MinQuantity=1&GameName=Magic'}
+# labels of requests metric
+BRIEF_METRIC_LABELS = ('partner.tcgplayer.com', 'tcgplayer')
+FULL_METRIC_LABELS = ('store.tcgplayer.com', 'tcgplayer')
 
 
 class TCGPlayerScrapper(object):
@@ -40,10 +48,10 @@ class TCGPlayerScrapper(object):
 
         :return: dictionary {sid, tcg card url, low, mid, high}
         """
-        tcg_response = openurl(self.brief_url)
+        tcg_response = openurl(self.brief_url, labels=BRIEF_METRIC_LABELS)
         html_response = tcg_response.replace('\'+\'', '').replace('\\\'', '"')[16:][:-3]
 
-        tcg_soup = BeautifulSoup(html_response)
+        tcg_soup = parsing.parse(html_response, BRIEF_PART)
         link_container = tcg_soup.find('td', class_='TCGPHiLoLink')
         if link_container is None:
             return None
@@ -57,49 +65,103 @@ class TCGPlayerScrapper(object):
         return prices
 
     def get_full_info(self):
-        """Parses offers info for card
+        """Parses offers info for card. First page tells pages number,
+        rest of pages are downloaded in parallel.
 
         :return: dict {'seller': models.TCGSeller, 'offers': list of models.TCGCardOffer}
         """
-        sellers_offers = []
-        link = self.full_url
-        while True:
-            page = openurl(link, additional_headers=FULL_URL_COOKIE)
-            soup = BeautifulSoup(page)
-
-            offers_block = soup.find('table', class_='priceTable').find_all('tr', class_='vendor')
-            for block in offers_block:
-                offer_td = block.find('td', class_='seller')
-                name = ext.uni(offer_td.find('a').text)
-                url = ext.get_domain(self.full_url) + offer_td.find('a')['href']
-                rating = ext.uni(offer_td.find('span', class_='actualRating').find('a').contents[0]).split()[1]
-                sales = ext.result_or_default(
-                    lambda: ext.uni(offer_td.find('span', class_='ratingHeading').find('a').contents[0]),
-                    default='')
-                number = int(block.find('td', class_='quantity').text.strip())
-                price = filters.price_str_to_float(ext.uni(block.find('td', class_='price').contents[0]))
-                condition = ext.uni(block.find('td', class_='condition').find('a').contents[0])
-
-                sellers_offers.append({'seller': models.TCGSeller(name, url, rating, sales),
-                                       'offers': models.TCGCardOffer(self.sid, condition, number, price)})
-
+        soup = parsing.parse(self._open_page(self.full_url), PRICE_TABLE_PART, remember=False)
+        sellers_offers = self._parse_offers(soup)
+
+        link_next = self._get_next_link(soup)
+        if 'disabled' not in link_next.attrs:
+            pages_urls = self._get_pages_urls(soup, link_next['href'])
+            pool = eventlet.GreenPool(PAGES_POOL_SIZE)
+            for page in pool.imap(self._open_page, pages_urls):
+                soup = parsing.parse(page, PRICE_TABLE_PART, remember=False)
+                sellers_offers.extend(self._parse_offers(soup))
+
+            # pager could show less pages than there are, rest of them are followed one by one
             link_next = self._get_next_link(soup)
-            if 'disabled' in link_next.attrs:
-                break
-
-            link = ext.get_domain(self.full_url) + link_next['href']
+            while 'disabled' not in link_next.attrs:
+                soup = parsing.parse(self._open_page(ext.get_domain(self.full_url) + link_next['href']),
+                                     PRICE_TABLE_PART, remember=False)
+                sellers_offers.extend(self._parse_offers(soup))
+                link_next = self._get_next_link(soup)
 
         grouped_sellers = [{'seller': k, 'offers': [seller_offer['offers'] for seller_offer in g]}
                            for k, g in itertools.groupby(sellers_offers, key=lambda so: so['seller'])]
 
         return grouped_sellers
 
+    def _open_page(self, link):
+        return openurl(link, additional_headers=FULL_URL_COOKIE, use_cache=False, labels=FULL_METRIC_LABELS)
+
+    def _parse_offers(self, soup):
+        """Parses offers from price table page
+
+        :param soup: parsed page with list of prices
+        :return: list of dict {'seller': models.TCGSeller, 'offers': models.TCGCardOffer}
+        """
+        sellers_offers = []
+        domain = ext.get_domain(self.full_url)
+        for block in soup.find_all('tr', class_='vendor'):
+            cells = self._get_cells_by_class(block, 'td')
+            offer_td = cells['seller']
+            seller_link = offer_td.find('a')
+            spans = self._get_cells_by_class(offer_td, 'span')
+
+            name = ext.uni(seller_link.text)
+            url = domain + seller_link['href']
+            rating = ext.uni(spans['actualRating'].find('a').contents[0]).split()[1]
+            sales = ext.result_or_default(lambda: ext.uni(spans['ratingHeading'].find('a').contents[0]), default='')
+            number = int(cells['quantity'].text.strip())
+            price = filters.price_str_to_float(ext.uni(cells['price'].contents[0]))
+            condition = ext.uni(cells['condition'].find('a').contents[0])
+
+            sellers_offers.append({'seller': models.TCGSeller(name, url, rating, sales),
+                                   'offers': models.TCGCardOffer(self.sid, condition, number, price)})
+
+        return sellers_offers
+
+    def _get_cells_by_class(self, tag, name):
+        """Collects descendants with tag name by each of their classes in one pass,
+        so one row isn't searched again for every cell
+
+        :param tag: bs4.Tag
+        :param name: name of descendants
+        :return: dict {class: first descendant with it}
+        """
+        cells = {}
+        for cell in tag.find_all(name):
+            for class_name in cell.get('class') or []:
+                cells.setdefault(class_name, cell)
+
+        return cells
+
+    def _get_pages_urls(self, soup, next_href):
+        """Builds urls of pages after the first one using pager numbers and link to the second page
+
+        :param soup: parsed first page
+        :param next_href: href of Next link on the first page
+        :return: list of urls starting from the second page
+        """
+        pager_block = soup.find('div', class_='pricePager')
+        pages_numbers = [int(a.text.strip()) for a in pager_block.find_all('a') if a.text.strip().isdigit()]
+        page_param = ext.get_first(ext.get_query_string_params(next_href).items(), lambda kv: kv[1] == '2')
+        page_re = re.compile(r'([?&]%s=)2(?=&|$)' % re.escape(page_param[0])) if page_param else None
+        if not pages_numbers or page_re is None or page_re.search(next_href) is None:
+            return [ext.get_domain(self.full_url) + next_href]
+
+        return [ext.get_domain(self.full_url) + page_re.sub(r'\g<1>%d' % number, next_href)
+                for number in range(2, max(pages_numbers + [2]) + 1)]
+
     def _get_next_link(self, soup):
         """Parses soup to find tag with link to Next page in list
 
-        :param soup: soup page with list of prices
+        :param soup: parsed page with list of prices
         :return: link Next page tag
         """
         pager_block = soup.find('div', class_='pricePager')
         next_link_tag = pager_block.find('a', text=re.compile(r'Next'))
-        return next_link_tag
\ No newline at end of file
+        return next_link_tag
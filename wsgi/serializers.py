@@ -0,0 +1,215 @@
+import array
+import os
+import sys
+from bson.binary import Binary
+import models
+
+# offers of task entry are stored as columns in binary field instead of list of documents
+PACKED_OFFERS = os.environ.get('PACKED_OFFERS', 'on') != 'off'
+PACKED_OFFERS_VERSION = 1
+# typecodes of packed offers columns: seller item index, condition index, number, price
+PACKED_COLUMNS = ('I', 'H', 'I', 'd')
+
+
+def encode_card(card):
+    return {'name': card.name,
+            'number': card.number,
+            'redactions': [encode_reda(reda) for reda in card.redactions]}
+
+
+def decode_card(dict_card):
+    """
+    Converts dict to models.Card, redactions are converted when they are read
+    """
+    redas = models.LazyList(dict_card['redactions'], decode_reda) if dict_card.get('redactions') else None
+    return models.Card(dict_card['name'], dict_card['number'], redactions=redas)
+
+
+def encode_reda(reda):
+    info = reda.info
+    prices = reda.prices
+    return {'name': reda.name,
+            'info': {'url': info.url, 'img_url': info.img_url, 'description': info.description}
+            if info is not None else None,
+            'prices': {'sid': prices.sid, 'url': prices.url, 'low': prices.low, 'mid': prices.mid,
+                       'high': prices.high} if prices is not None else None}
+
+
+def decode_reda(dict_reda):
+    """
+    Converts dict to models.Redaction, info could be partially projected
+    """
+    dict_info = dict_reda.get('info')
+    info = models.CardInfo(dict_info.get('url'), dict_info.get('img_url'), dict_info.get('description')) \
+        if dict_info else None
+    dict_prices = dict_reda.get('prices')
+    prices = models.CardPrices(dict_prices['sid'], dict_prices['url'], dict_prices['low'], dict_prices['mid'],
+                               dict_prices['high']) if dict_prices else None
+    return models.Redaction(dict_reda['name'], info=info, prices=prices)
+
+
+def encode_task(task):
+    return {'token': task.token,
+            'status': task.status,
+            'entries': [encode_entry(entry) for entry in task.entries] if task.entries is not None else None}
+
+
+def decode_task(dict_task):
+    """
+    Converts dict to models.Task
+    """
+    entries = [decode_entry(e) for e in dict_task['entries']] if dict_task.get('entries') else None
+    return models.Task(dict_task['token'], dict_task['status'], entries=entries)
+
+
+def encode_entry(entry):
+    return {'card_name': entry.card_name,
+            'card_reda': entry.card_reda,
+            'card_sid': entry.card_sid,
+            'status': entry.status,
+            'offers': encode_offers(entry.offers)}
+
+
+def decode_entry(dict_entry):
+    """
+    Converts dict to models.TaskEntry, offers are converted when they are read
+    """
+    return models.TaskEntry(dict_entry['card_name'], dict_entry['card_reda'], dict_entry['card_sid'],
+                            dict_entry['status'], offers=decode_offers(dict_entry.get('offers')))
+
+
+def encode_offers(offers, packed=None):
+    """Encodes parsed offers of task entry
+
+    :param offers: list of dict {'seller': models.TCGSeller, 'offers': list of models.TCGCardOffer} or None
+    :param packed: if True, offers are packed to binary columns, by default PACKED_OFFERS is used
+    :return: list of dicts, dict with packed offers or None
+    """
+    if offers is None:
+        return None
+
+    if packed if packed is not None else PACKED_OFFERS:
+        return pack_offers(offers)
+
+    return [{'seller': encode_seller(item['seller']), 'offers': [encode_offer(o) for o in item['offers']]}
+            for item in offers]
+
+
+def decode_offers(value):
+    """
+    Converts stored offers of task entry in any encoding to list of dict {seller, offers}
+    """
+    if not value:
+        return None
+
+    if isinstance(value, dict):
+        return unpack_offers(value)
+
+    return models.LazyList(value, decode_seller_offers)
+
+
+def decode_seller_offers(dict_item):
+    return {'seller': decode_seller(dict_item['seller']),
+            'offers': [decode_offer(o) for o in dict_item['offers']]}
+
+
+def encode_seller(seller):
+    return {'name': seller.name, 'url': seller.url, 'rating': seller.rating, 'sales': seller.sales}
+
+
+def decode_seller(dict_seller):
+    return models.TCGSeller(dict_seller['name'], dict_seller['url'], dict_seller['rating'], dict_seller['sales'])
+
+
+def encode_offer(offer):
+    return {'sid': offer.sid, 'condition': offer.condition, 'number': offer.number, 'price': offer.price}
+
+
+def decode_offer(dict_offer):
+    return models.TCGCardOffer(dict_offer['sid'], dict_offer['condition'], dict_offer['number'],
+                               dict_offer['price'])
+
+
+def pack_offers(offers):
+    """Packs offers to little endian columns, sellers, conditions and sids are stored once
+
+    :param offers: list of dict {'seller': models.TCGSeller, 'offers': list of models.TCGCardOffer}
+    :return: dict {v, sellers, conditions, sids, rows, columns}
+    """
+    sellers = []
+    conditions, conditions_index = [], {}
+    sids, sids_index = [], {}
+    columns = [array.array(typecode) for typecode in PACKED_COLUMNS]
+    sid_column = array.array('H')
+
+    for item_index, item in enumerate(offers):
+        seller = item['seller']
+        sellers.append([seller.name, seller.url, seller.rating, seller.sales])
+        for offer in item['offers']:
+            condition_index = conditions_index.get(offer.condition)
+            if condition_index is None:
+                condition_index = conditions_index[offer.condition] = len(conditions)
+                conditions.append(offer.condition)
+
+            sid_index = sids_index.get(offer.sid)
+            if sid_index is None:
+                sid_index = sids_index[offer.sid] = len(sids)
+                sids.append(offer.sid)
+
+            columns[0].append(item_index)
+            columns[1].append(condition_index)
+            columns[2].append(offer.number)
+            columns[3].append(offer.price)
+            sid_column.append(sid_index)
+
+    if len(sids) > 1:
+        columns.append(sid_column)
+
+    return {'v': PACKED_OFFERS_VERSION,
+            'sellers': sellers,
+            'conditions': conditions,
+            'sids': sids,
+            'rows': len(columns[0]),
+            'columns': Binary(''.join([_to_little_endian(column) for column in columns]))}
+
+
+def unpack_offers(packed):
+    """Converts packed offers back to list of dict {seller, offers}
+
+    :param packed: dict made by pack_offers
+    :return: list of dict {'seller': models.TCGSeller, 'offers': list of models.TCGCardOffer}
+    """
+    rows = packed['rows']
+    sids = packed['sids']
+    typecodes = PACKED_COLUMNS + (('H',) if len(sids) > 1 else ())
+
+    data = str(packed['columns'])
+    columns = []
+    start = 0
+    for typecode in typecodes:
+        column = array.array(typecode)
+        end = start + rows * column.itemsize
+        column.fromstring(data[start:end])
+        if sys.byteorder == 'big':
+            column.byteswap()
+        columns.append(column)
+        start = end
+
+    items = [{'seller': models.TCGSeller(*seller), 'offers': []} for seller in packed['sellers']]
+    conditions = packed['conditions']
+    item_indexes, condition_indexes, numbers, prices = columns[:4]
+    sid_indexes = columns[4] if len(columns) > 4 else None
+    for i in xrange(rows):
+        sid = sids[sid_indexes[i]] if sid_indexes is not None else sids[0]
+        items[item_indexes[i]]['offers'].append(models.TCGCardOffer(sid, conditions[condition_indexes[i]],
+                                                                    numbers[i], prices[i]))
+
+    return items
+
+
+def _to_little_endian(column):
+    if sys.byteorder == 'big':
+        column = array.array(column.typecode, column)
+        column.byteswap()
+
+    return column.tostring()
@@ -1,15 +1,22 @@
 import itertools
-from subprocess import Popen, PIPE
+import os
+import socket
+import sys
+import uuid
+from subprocess import Popen
 import models
 import db
 
+WORKERS_NUM = int(os.environ.get('WORKERS_NUM', '2'))
 
-def get_task(token):
+
+def get_task(token, with_offers=True):
     """Returns task for token or creates new
 
     :param token: str
+    :param with_offers: if False, parsed offers aren't loaded
     """
-    task = db.get_task(token)
+    task = db.get_task(token, with_offers)
     if task is None:
         task = create_new_task(token)
         db.save_task(task)
@@ -21,7 +28,7 @@ def create_new_task(token):
     """
     Creates new task fot token
     """
-    cards = db.get_cards(token, only_resolved=True)
+    cards = db.get_cards(token, only_resolved=True, fields=db.CARD_BRIEF_FIELDS)
     task_entries = itertools.chain(
         *[[models.TaskEntry(card.name, reda.name, reda.prices.sid) for reda in card.redactions]
           for card in cards])
@@ -29,32 +36,34 @@ def create_new_task(token):
     return models.Task(token, entries=list(task_entries))
 
 
-def run_daemon():
+def enqueue(token, kind='tcg'):
+    """Adds parsing job for token and starts workers if there are less of them than queued jobs
+
+    :param token: str
+    :param kind: tcg or name of shop which offers are parsed
+    """
+    db.enqueue_job(token, kind)
+
+    missing_workers = min(WORKERS_NUM - db.get_alive_workers_num(), db.get_queued_jobs_num())
+    for _ in range(missing_workers):
+        start_worker()
+
+
+def start_worker():
     """
-    Runs daemon script if it wasn't started
+    Registers and runs new worker process, so it is counted as alive before it starts
     """
-    if not daemon_is_run():
-        import os
-        import sys
-
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        script_path = os.path.join(base_dir, 'worker/daemon.py')
-
-        if 'OPENSHIFT_APP_NAME' in os.environ:
-            PY_VERSION = 'python-' + ('.'.join(map(str, sys.version_info[:2])))
-            sys.path.insert(0, os.path.dirname(__file__) or '.')
-            python_exec = os.environ['HOME'] + '/' + PY_VERSION + '/virtenv/bin/python'
-        else:
-            python_exec = os.path.join(base_dir, 'venv/bin/python')
-
-        Popen(['nohup', python_exec, script_path])
-
-
-def daemon_is_run():
-    ps_comm = 'ps aux'
-    grep_comm = 'grep daemon.py'
-    ps_exec = Popen(ps_comm.split(), stdout=PIPE)
-    grep_exec = Popen(grep_comm.split(), stdin=ps_exec.stdout, stdout=PIPE)
-    result = grep_exec.communicate()[0]
-    lines = [line for line in result.split('\n') if 'grep' not in line and line]
-    return len(lines) > 0
\ No newline at end of file
+    worker_id = '%s-%s' % (socket.gethostname(), uuid.uuid4().hex[:8])
+    db.save_worker(worker_id)
+
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script_path = os.path.join(base_dir, 'worker/daemon.py')
+
+    if 'OPENSHIFT_APP_NAME' in os.environ:
+        PY_VERSION = 'python-' + ('.'.join(map(str, sys.version_info[:2])))
+        sys.path.insert(0, os.path.dirname(__file__) or '.')
+        python_exec = os.environ['HOME'] + '/' + PY_VERSION + '/virtenv/bin/python'
+    else:
+        python_exec = os.path.join(base_dir, 'venv/bin/python')
+
+    Popen(['nohup', python_exec, script_path, worker_id])
@@ -1,45 +1,123 @@
 import os
+import socket
 import sys
+import time
+import traceback
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import eventlet
 import db
+import schema
+import scrapers
 import worker
 from scrapers.tcgplayer import TCGPlayerScrapper
 
+POLL_INTERVAL = float(os.environ.get('WORKER_POLL_INTERVAL', '2'))
+IDLE_TIMEOUT = float(os.environ.get('WORKER_IDLE_TIMEOUT', '30'))
+HEARTBEAT_INTERVAL = float(os.environ.get('WORKER_HEARTBEAT_INTERVAL', '10'))
+ENTRIES_POOL_SIZE = int(os.environ.get('WORKER_ENTRIES_POOL_SIZE', '4'))
+FLUSH_INTERVAL = float(os.environ.get('WORKER_FLUSH_INTERVAL', '2'))
 
-def run():
+
+def run(worker_id):
+    """Executes jobs from queue, exits when queue is empty longer than idle timeout
+
+    :param worker_id: unique id of worker process
+    """
+    schema.bootstrap()
+    current_job = {}
+    db.save_worker(worker_id)
+    heartbeat = eventlet.spawn(keep_alive, worker_id, current_job)
+
+    try:
+        idle_since = time.time()
+        while time.time() - idle_since < IDLE_TIMEOUT:
+            db.requeue_expired_jobs()
+            job = db.lease_job(worker_id)
+            if job is None:
+                eventlet.sleep(POLL_INTERVAL)
+                continue
+
+            current_job['id'] = job['_id']
+            try:
+                execute_job(job)
+                db.complete_job(job['_id'], worker_id)
+            except Exception:
+                # job will be leased again when its lease expires
+                traceback.print_exc()
+            finally:
+                current_job.pop('id', None)
+
+            idle_since = time.time()
+    finally:
+        heartbeat.kill()
+        db.delete_worker(worker_id)
+
+
+def keep_alive(worker_id, current_job):
+    """Periodically updates worker heartbeat and lease of its current job
+
+    :param worker_id: unique id of worker process
+    :param current_job: dict with id of job that is executed now
     """
-    Runs parsing sellers for each non 'updated' tasks
+    while True:
+        eventlet.sleep(HEARTBEAT_INTERVAL)
+        db.save_worker(worker_id)
+        if 'id' in current_job:
+            db.extend_job_lease(current_job['id'], worker_id)
+
+
+def execute_job(job):
+    """Executes leased job
+
+    :param job: dict with job from queue
     """
-    tokens = db.get_tokens()
-    for token in tokens:
-        task = worker.get_task(token)
-        if task.status == 'updated':
-            continue
+    if job.get('kind', 'tcg') in scrapers.SHOPS:
+        scrapers.refresh_shop_offers(job['kind'],
+                                     db.get_cards(job['token'], only_resolved=True, fields=db.CARD_BRIEF_FIELDS))
+        return
 
+    # entries that are already parsed aren't changed, so their offers aren't loaded
+    task = worker.get_task(job['token'], with_offers=False)
+    if task.status != 'updated':
         execute(task)
 
 
 def execute(task):
-    """Parses tcgplayer sellers info for cards in specified task
+    """Parses tcgplayer sellers info for cards in specified task.
+    Parsed entries are written in batches at most once per flush interval, only their offers and status are sent.
 
     :param task: instance of models.Task
     :return:
     """
-    for entry in task.entries:
-        if entry.status == 'updated':
-            continue
-
-        scrapper = TCGPlayerScrapper(entry.card_sid)
-        offers = scrapper.get_full_info()
+    indexed_entries = [(i, e) for i, e in enumerate(task.entries) if e.status != 'updated']
+    parsed = []
+    flushed_at = time.time()
+    for (index, entry), offers in scrape_entries(indexed_entries):
         entry.offers = offers
         entry.status = 'updated'
-        db.save_task(task)
+        parsed.append((index, entry))
+
+        if time.time() - flushed_at >= FLUSH_INTERVAL:
+            db.save_task_entries(task.token, parsed)
+            parsed = []
+            flushed_at = time.time()
 
+    db.save_task_entries(task.token, parsed)
     task.status = 'updated'
-    db.save_task(task)
+    db.save_task_status(task.token, task.status)
+
+
+def scrape_entries(entries):
+    """Parses offers of several entries at the same time
+
+    :param entries: list of tuples (position in task, models.TaskEntry)
+    :return: iterator of tuples ((position in task, models.TaskEntry), offers) in order of entries
+    """
+    pool = eventlet.GreenPool(ENTRIES_POOL_SIZE)
+    return pool.imap(lambda item: (item, TCGPlayerScrapper(item[1].card_sid).get_full_info()), entries)
 
 
 if __name__ == '__main__':
-    run()
\ No newline at end of file
+    run(sys.argv[1] if len(sys.argv) > 1 else '%s-%d' % (socket.gethostname(), os.getpid()))
@@ -0,0 +1,97 @@
+import os
+import sys
+import traceback
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import eventlet
+import db
+import models
+import schema
+from scrapers import scheduler
+from scrapers.tcgplayer import TCGPlayerScrapper
+
+REFRESH_RATE = float(os.environ.get('PRICES_REFRESH_RATE', '2'))
+REFRESH_BATCH = int(os.environ.get('PRICES_REFRESH_BATCH', '100'))
+REFRESH_MAX = int(os.environ.get('PRICES_REFRESH_MAX', '5000'))
+REFRESH_POOL_SIZE = int(os.environ.get('PRICES_REFRESH_POOL_SIZE', '4'))
+REFRESH_SUMMARIES_MAX = int(os.environ.get('PRICES_REFRESH_SUMMARIES_MAX', '1000'))
+
+
+def run(max_sids=REFRESH_MAX):
+    """Refreshes brief prices of stale sids of catalog in batches, the oldest first.
+    Catalog is filled with sids of stored lists by migration on the first run.
+    Every sid is fetched once, sids which requests failed are left stale and aren't fetched again by this run.
+    Run stops if all requests of batch failed. Summaries of lists with changed prices are recalculated at the end.
+
+    :param max_sids: max number of sids refreshed by one run
+    :return: number of checked sids
+    """
+    schema.bootstrap()
+    schema.apply_migrations()
+
+    bucket = scheduler.TokenBucket(REFRESH_RATE, burst=1)
+    checked = 0
+    failed = []
+    while checked < max_sids:
+        sids = db.get_stale_sids(min(REFRESH_BATCH, max_sids - checked), skipped=failed)
+        if not sids:
+            break
+
+        batch_failed = refresh_batch(sids, bucket)
+        failed.extend(batch_failed)
+        checked += len(sids) - len(batch_failed)
+        if len(batch_failed) == len(sids):
+            break
+
+    refresh_summaries()
+    return checked
+
+
+def refresh_batch(sids, bucket):
+    """Fetches brief prices of sids at rate of bucket and saves them, lists with changed prices are marked by db.
+    Sids unknown to tcg are marked as checked, sids which requests failed are left stale.
+
+    :param sids: list of tcg sids
+    :param bucket: scheduler.TokenBucket object
+    :return: list of sids which requests failed
+    """
+    pool = eventlet.GreenPool(REFRESH_POOL_SIZE)
+    results = zip(sids, pool.imap(lambda sid: fetch_prices(sid, bucket), sids))
+
+    db.save_sid_prices([card_prices for _, card_prices in results if isinstance(card_prices, models.CardPrices)])
+    db.touch_sid_prices([sid for sid, card_prices in results if card_prices is None])
+
+    return [sid for sid, card_prices in results if card_prices is False]
+
+
+def refresh_summaries(max_lists=REFRESH_SUMMARIES_MAX):
+    """Recalculates stale summaries of lists which prices were changed
+
+    :param max_lists: max number of recalculated summaries
+    :return: number of recalculated summaries
+    """
+    tokens = db.get_stale_summaries_tokens(max_lists)
+    for token in tokens:
+        db.refresh_cards_summary(token)
+
+    return len(tokens)
+
+
+def fetch_prices(sid, bucket):
+    """Fetches brief prices of sid when bucket allows
+
+    :return: models.CardPrices, None if tcg doesn't know sid or False if request failed
+    """
+    eventlet.sleep(bucket.reserve())
+    try:
+        brief_prices_info = TCGPlayerScrapper(sid).get_brief_info()
+    except Exception:
+        traceback.print_exc()
+        return False
+
+    return models.CardPrices(**brief_prices_info) if brief_prices_info is not None else None
+
+
+if __name__ == '__main__':
+    print 'checked sids: %d' % run(int(sys.argv[1]) if len(sys.argv) > 1 else REFRESH_MAX)